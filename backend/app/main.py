@@ -3,9 +3,10 @@
 from __future__ import annotations
 
 import argparse
-import json
+import os
 import sys
 from pathlib import Path
+from typing import TextIO
 
 # ANSI color codes for terminal output
 _GREEN = "\033[32m"
@@ -16,20 +17,27 @@ _BOLD = "\033[1m"
 _RESET = "\033[0m"
 
 
-def _color(text: str, code: str) -> str:
-    """Wrap text in ANSI color codes."""
-    return f"{code}{text}{_RESET}"
+def _use_color(stream: TextIO) -> bool:
+    """Only emit escape codes for an interactive terminal, honoring NO_COLOR."""
+    if os.environ.get("NO_COLOR"):
+        return False
+    isatty = getattr(stream, "isatty", None)
+    return bool(isatty and isatty())
 
 
-def build_parser() -> argparse.ArgumentParser:
-    """Build the CLI argument parser with subcommands."""
-    parser = argparse.ArgumentParser(
-        prog="anontool",
-        description="Local file anonymization/de-anonymization tool powered by spaCy NER.",
-    )
-    subparsers = parser.add_subparsers(dest="command", help="Available commands")
+def _color(text: str, code: str, stream: TextIO | None = None) -> str:
+    """Wrap text in ANSI color codes (plain text when color is disabled).
 
-    # anonymize
+    The check is made against the stream the text is printed to (sys.stdout
+    by default) at call time, so redirects and stderr are handled correctly.
+    """
+    if not _use_color(sys.stdout if stream is None else stream):
+        return text
+    return f"{code}{text}{_RESET}"
+
+
+def _add_anonymize_parser(subparsers: argparse._SubParsersAction) -> None:
+    """Register the anonymize subcommand."""
     anon = subparsers.add_parser(
         "anonymize",
         help="Anonymize a file by replacing names with pseudonyms",
@@ -45,7 +53,9 @@ def build_parser() -> argparse.ArgumentParser:
         help="Use Ollama LLM for enhanced entity verification",
     )
 
-    # deanonymize
+
+def _add_deanonymize_parser(subparsers: argparse._SubParsersAction) -> None:
+    """Register the deanonymize subcommand."""
     deanon = subparsers.add_parser(
         "deanonymize",
         help="Restore anonymized file using a mapping",
@@ -58,20 +68,26 @@ def build_parser() -> argparse.ArgumentParser:
         "--output", help="Output file path (auto-generated if omitted)"
     )
 
-    # list-mappings
+
+def _add_list_mappings_parser(subparsers: argparse._SubParsersAction) -> None:
+    """Register the list-mappings subcommand."""
     subparsers.add_parser(
         "list-mappings",
         help="List all available mapping IDs",
     )
 
-    # show-mapping
+
+def _add_show_mapping_parser(subparsers: argparse._SubParsersAction) -> None:
+    """Register the show-mapping subcommand."""
     show = subparsers.add_parser(
         "show-mapping",
         help="Display a mapping's contents",
     )
     show.add_argument("mapping_id", help="The mapping ID to display")
 
-    # bulk-anonymize
+
+def _add_bulk_anonymize_parser(subparsers: argparse._SubParsersAction) -> None:
+    """Register the bulk-anonymize subcommand."""
     bulk = subparsers.add_parser(
         "bulk-anonymize",
         help="Anonymize all files in a folder into one merged output",
@@ -88,6 +104,59 @@ def build_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Use Ollama LLM for enhanced entity verification",
     )
+    bulk.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=(
+            "Re-detect entities in every file instead of reusing cached results "
+            "(the cache, ~/.anontool/detect_cache.sqlite3, stores detected "
+            "entity text)"
+        ),
+    )
+
+
+# Subcommand name -> function that registers its subparser (in --help order)
+_SUBPARSER_BUILDERS = {
+    "anonymize": _add_anonymize_parser,
+    "deanonymize": _add_deanonymize_parser,
+    "list-mappings": _add_list_mappings_parser,
+    "show-mapping": _add_show_mapping_parser,
+    "bulk-anonymize": _add_bulk_anonymize_parser,
+}
+
+
+def _sniff_subcommand(argv: list[str]) -> str | None:
+    """Return the subcommand named in argv, or None if there isn't a known one.
+
+    Only the first non-flag token is considered, since the top-level parser
+    takes no options other than --help.
+    """
+    for arg in argv:
+        if arg.startswith("-"):
+            continue
+        return arg if arg in _SUBPARSER_BUILDERS else None
+    return None
+
+
+def build_parser(command: str | None = None) -> argparse.ArgumentParser:
+    """Build the CLI argument parser with subcommands.
+
+    Args:
+        command: If given, only this subcommand's parser is constructed.
+            Otherwise all subcommands are registered (needed for --help
+            and for reporting unknown commands).
+    """
+    parser = argparse.ArgumentParser(
+        prog="anontool",
+        description="Local file anonymization/de-anonymization tool powered by spaCy NER.",
+    )
+    subparsers = parser.add_subparsers(dest="command", help="Available commands")
+
+    if command in _SUBPARSER_BUILDERS:
+        _SUBPARSER_BUILDERS[command](subparsers)
+    else:
+        for add_parser in _SUBPARSER_BUILDERS.values():
+            add_parser(subparsers)
 
     return parser
 
@@ -98,7 +167,10 @@ def cmd_anonymize(args: argparse.Namespace) -> int:
 
     input_path = Path(args.input_file)
     if not input_path.exists():
-        print(_color(f"Error: File not found: {input_path}", _RED), file=sys.stderr)
+        print(
+            _color(f"Error: File not found: {input_path}", _RED, sys.stderr),
+            file=sys.stderr,
+        )
         return 1
 
     try:
@@ -109,7 +181,7 @@ def cmd_anonymize(args: argparse.Namespace) -> int:
             use_ollama=args.use_ollama,
         )
     except ValueError as e:
-        print(_color(f"Error: {e}", _RED), file=sys.stderr)
+        print(_color(f"Error: {e}", _RED, sys.stderr), file=sys.stderr)
         return 1
 
     print(_color("Anonymization complete!", _GREEN))
@@ -141,17 +213,21 @@ def cmd_deanonymize(args: argparse.Namespace) -> int:
 
     input_path = Path(args.input_file)
     if not input_path.exists():
-        print(_color(f"Error: File not found: {input_path}", _RED), file=sys.stderr)
+        print(
+            _color(f"Error: File not found: {input_path}", _RED, sys.stderr),
+            file=sys.stderr,
+        )
         return 1
 
     mapping_path = Path.home() / ".anontool" / "mappings" / f"{args.mapping_id}.json"
     if not mapping_path.exists():
         print(
-            _color(f"Error: Mapping not found: {args.mapping_id}", _RED),
+            _color(f"Error: Mapping not found: {args.mapping_id}", _RED, sys.stderr),
             file=sys.stderr,
         )
         print(
-            f"  Available mappings: run {_color('anontool list-mappings', _CYAN)}",
+            "  Available mappings: run "
+            + _color("anontool list-mappings", _CYAN, sys.stderr),
             file=sys.stderr,
         )
         return 1
@@ -193,13 +269,14 @@ def cmd_show_mapping(args: argparse.Namespace) -> int:
 
     if not mapping_path.exists():
         print(
-            _color(f"Error: Mapping not found: {args.mapping_id}", _RED),
+            _color(f"Error: Mapping not found: {args.mapping_id}", _RED, sys.stderr),
             file=sys.stderr,
         )
         return 1
 
-    with open(mapping_path) as f:
-        data = json.load(f)
+    from app.services import jsonio
+
+    data = jsonio.loads(mapping_path.read_bytes())
 
     print(_color(f"Mapping: {data['mapping_id']}", _BOLD))
     print(f"  Created: {data.get('created', 'unknown')}")
@@ -227,10 +304,16 @@ def cmd_bulk_anonymize(args: argparse.Namespace) -> int:
 
     folder_path = Path(args.folder)
     if not folder_path.exists():
-        print(_color(f"Error: Folder not found: {folder_path}", _RED), file=sys.stderr)
+        print(
+            _color(f"Error: Folder not found: {folder_path}", _RED, sys.stderr),
+            file=sys.stderr,
+        )
         return 1
     if not folder_path.is_dir():
-        print(_color(f"Error: Not a directory: {folder_path}", _RED), file=sys.stderr)
+        print(
+            _color(f"Error: Not a directory: {folder_path}", _RED, sys.stderr),
+            file=sys.stderr,
+        )
         return 1
 
     def progress(current: int, total: int, filename: str) -> None:
@@ -243,15 +326,18 @@ def cmd_bulk_anonymize(args: argparse.Namespace) -> int:
             mapping_id=args.mapping_id,
             use_ollama=args.use_ollama,
             progress_callback=progress,
+            use_cache=not args.no_cache,
         )
     except ValueError as e:
-        print(_color(f"Error: {e}", _RED), file=sys.stderr)
+        print(_color(f"Error: {e}", _RED, sys.stderr), file=sys.stderr)
         return 1
 
     print()
     print(_color("Bulk anonymization complete!", _GREEN))
     print(f"  Files processed: {_color(str(result.files_processed), _CYAN)}")
     print(f"  Total entities:  {_color(str(result.total_entities), _CYAN)}")
+    if result.cache_hits:
+        print(f"  Cached results:  {_color(str(result.cache_hits), _CYAN)}")
     print(f"  Output file:     {_color(result.output_path, _CYAN)}")
     print(f"  Mapping ID:      {_color(result.mapping_id, _YELLOW)}")
 
@@ -266,7 +352,9 @@ def cmd_bulk_anonymize(args: argparse.Namespace) -> int:
 
 def main(argv: list[str] | None = None) -> int:
     """Entry point."""
-    parser = build_parser()
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = build_parser(_sniff_subcommand(argv))
     args = parser.parse_args(argv)
 
     if args.command is None:
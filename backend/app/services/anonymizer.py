@@ -2,14 +2,37 @@
 
 from __future__ import annotations
 
+import mmap
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
 
-from app.services.detector import DetectedEntity, detect_entities
+from app.services.detection_cache import DetectionCache
+from app.services.detector import (
+    DetectedEntity,
+    detect_entities,
+    detect_entities_batch,
+    detect_workers_override,
+    detector_version,
+)
 from app.services.mapping_store import MappingStore
+from app.services.replacer import splice
 
-_SUPPORTED_EXTENSIONS = {".txt", ".md"}
+_SUPPORTED_EXTENSIONS = frozenset({".txt", ".md"})
+_MMAP_MIN_BYTES = 1 << 20  # Memory-map inputs of 1 MiB and up
+_READ_CHUNK_BYTES = 64 << 10  # Minimum os.read size in _read_text_fast
+# Smaller folders are detected serially: starting worker processes (each
+# loading its own spaCy model) costs more than it saves
+_PARALLEL_MIN_FILES = 4
+_PARALLEL_MIN_BYTES = 2 << 20
+# Default upper bound on worker processes, for the same reason
+_MAX_DETECT_WORKERS = 4
+
+# Write buffer for anonymize_folder's merged output
+_OUTPUT_BUFFER_BYTES = 1 << 20
 
 
 @dataclass
@@ -21,6 +44,34 @@ class AnonymizeResult:
     mapping_id: str = ""
 
 
+def _get_store(base_dir: Path | None, mapping_id: str) -> MappingStore:
+    """Return a loaded MappingStore, reusing the shared one while it is current.
+
+    The in-memory store is authoritative between calls; it is only re-read
+    when the JSON file was changed on disk by someone else (another process
+    or a direct MappingStore user). It is shared between threads, so hold
+    ``store.lock`` while using it.
+    """
+    return MappingStore.open_cached(mapping_id, base_dir)
+
+
+def get_mapping(mapping_id: str, base_dir: Path | None = None) -> MappingStore:
+    """Return the live store for a mapping, as used by the anonymize calls.
+
+    Unlike constructing a MappingStore and loading it, this hands back the
+    shared in-memory instance, so no JSON is re-read unless the file was
+    changed on disk by another writer.
+
+    Args:
+        mapping_id: Mapping ID to look up.
+        base_dir: Override base directory for mapping storage.
+
+    Returns:
+        The loaded MappingStore for mapping_id.
+    """
+    return _get_store(base_dir, mapping_id)
+
+
 def anonymize_text(
     text: str,
     mapping_id: str,
@@ -52,32 +103,123 @@ def anonymize_text(
         except Exception:
             pass  # Graceful fallback — use spaCy-only results
 
+    return _pseudonymize(text, entities, mapping_id, base_dir)
+
+
+def anonymize_texts(
+    texts: list[str],
+    mapping_ids: list[str],
+    base_dir: Path | None = None,
+    use_ollama: bool = False,
+) -> list[AnonymizeResult]:
+    """Anonymize several texts, running entity detection as one batch.
+
+    Equivalent to calling anonymize_text() on each (text, mapping_id) pair
+    in order, but spaCy processes all texts in a single nlp.pipe() pass and
+    Ollama verification (if enabled) is batched too. Texts sharing a
+    mapping ID get consistent pseudonyms, allocated in list order.
+
+    Args:
+        texts: The input texts to anonymize.
+        mapping_ids: Mapping ID for each text (creates or reuses).
+        base_dir: Override base directory for mapping storage.
+        use_ollama: Whether to use Ollama for entity verification.
+
+    Returns:
+        One AnonymizeResult per input text, in the same order.
+
+    Raises:
+        ValueError: If texts and mapping_ids differ in length.
+    """
+    if len(texts) != len(mapping_ids):
+        raise ValueError(f"Got {len(texts)} texts but {len(mapping_ids)} mapping IDs")
+
+    batch = detect_entities_batch(texts)
+    if use_ollama and texts:
+        batch = _verify_batch_with_ollama(list(zip(texts, batch)))
+
+    return [
+        _pseudonymize(text, entities, mapping_id, base_dir)
+        for text, entities, mapping_id in zip(texts, batch, mapping_ids)
+    ]
+
+
+def _verify_batch_with_ollama(
+    items: list[tuple[str, list[DetectedEntity]]],
+) -> list[list[DetectedEntity]]:
+    """Verify several documents' entities with Ollama in batched requests.
+
+    Args:
+        items: (text, entities) pairs, one per document.
+
+    Returns:
+        The verified entity list per document, or the unverified lists if
+        Ollama is unavailable or fails.
+    """
+    unverified = [entities for _, entities in items]
+    try:
+        import httpx
+
+        from app.services.ollama_client import OllamaClient
+    except ImportError:
+        return unverified  # Ollama support (httpx) not installed
+
+    try:
+        client = OllamaClient()
+        if client.is_available():
+            return client.verify_entities_batch(items)
+    except (httpx.HTTPError, ValueError):
+        # Graceful fallback — use spaCy-only results. ValueError covers
+        # undecodable JSON from the server.
+        pass
+    return unverified
+
+
+def _pseudonymize(
+    text: str,
+    entities: list[DetectedEntity],
+    mapping_id: str,
+    base_dir: Path | None = None,
+) -> AnonymizeResult:
+    """Replace already-detected entities with pseudonyms and save the mapping.
+
+    Args:
+        text: The input text to anonymize.
+        entities: Entities detected (and optionally verified) in the text.
+        mapping_id: ID for the pseudonym mapping (creates or reuses).
+        base_dir: Override base directory for mapping storage.
+
+    Returns:
+        AnonymizeResult with anonymized text, detected entities, and mapping ID.
+    """
     # Step 2: Get pseudonyms from mapping store
-    store = MappingStore(base_dir=base_dir)
-    store.create_or_load(mapping_id)
-
-    # Step 3: Replace entities right-to-left to preserve character offsets
-    result_text = text
-    # Sort entities by start position descending (right-to-left replacement)
-    sorted_entities = sorted(entities, key=lambda e: e.start, reverse=True)
-
-    for entity in sorted_entities:
-        pseudonym = store.get_pseudonym(entity.text, entity.entity_type)
-        result_text = (
-            result_text[: entity.start] + pseudonym + result_text[entity.end :]
+    store = _get_store(base_dir, mapping_id)
+    ordered = sorted(entities, key=lambda e: e.start)
+
+    # The store is shared with concurrent callers: hold its lock from the
+    # first lookup through the save so this text sees one consistent mapping
+    with store.lock:
+        # Step 3: Resolve pseudonyms right-to-left (the order new pseudonyms
+        # have always been allocated in), caching one lookup per unique entity
+        pseudonyms: dict[tuple[str, str], str] = {}
+        for entity in reversed(ordered):
+            key = (entity.text, entity.entity_type)
+            if key not in pseudonyms:
+                pseudonyms[key] = store.get_pseudonym(entity.text, entity.entity_type)
+
+        # Then rebuild the text in a single pass using the original offsets
+        result_text = splice(
+            text,
+            [(e.start, e.end, pseudonyms[(e.text, e.entity_type)]) for e in ordered],
         )
 
-    # Step 3b: Second pass — replace any remaining occurrences of mapped names
-    # that spaCy missed (e.g., names in list/heading contexts).
-    # Sort by length descending so longer names are replaced first.
-    entries = store.get_entries()
-    sorted_names = sorted(entries.keys(), key=len, reverse=True)
-    for real_name in sorted_names:
-        pseudonym = entries[real_name]["pseudonym"]
-        result_text = result_text.replace(real_name, pseudonym)
+        # Step 3b: Second pass — replace any remaining occurrences of mapped
+        # names that spaCy missed (e.g., names in list/heading contexts).
+        # A single sweep where longer names win over names they contain.
+        result_text = store.get_replacer()(result_text)
 
-    # Step 4: Save the mapping
-    store.save()
+        # Step 4: Save the mapping
+        store.save()
 
     return AnonymizeResult(
         anonymized_text=result_text,
@@ -104,24 +246,84 @@ def deanonymize_text(
     Raises:
         FileNotFoundError: If the mapping file doesn't exist.
     """
-    store = MappingStore(base_dir=base_dir)
-    data = store.create_or_load(mapping_id)
+    store = _get_store(base_dir, mapping_id)
+
+    with store.lock:
+        if not store.get_entries():
+            return text
+
+        # Single sweep; longest match wins, so "Person_AA" is never read as
+        # "Person_A" followed by "A"
+        replace = store.get_reverse_replacer()
+    return replace(text)
+
+
+def _read_input_text(path: Path) -> str:
+    """Read a UTF-8 input file, memory-mapping it when it is large.
+
+    Large files are decoded straight from the mapped pages, so the raw bytes
+    are never copied onto the heap alongside the decoded text. Line endings
+    are normalized (CRLF and CR become LF) the same way ``Path.read_text()``
+    does.
+
+    Args:
+        path: Path to the file to read.
+
+    Returns:
+        The decoded file contents.
+    """
+    with open(path, "rb") as f:
+        size = f.seek(0, 2)
+        if size == 0 or size < _MMAP_MIN_BYTES:
+            f.seek(0)
+            data = f.read()
+            text = data.decode("utf-8")
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    text = str(view, "utf-8")
+                finally:
+                    view.release()
+
+    return _normalize_newlines(text)
+
+
+def _read_text_fast(path: Path, size: int) -> str:
+    """Read a UTF-8 file whose size is already known from a directory scan.
+
+    Small files are read with raw ``os.read`` calls sized from the scan's
+    stat result, skipping the fstat/seek calls buffered ``open()`` makes.
+    The size is only a hint: reading continues to EOF, so a file that grew
+    since the scan is never cut short. Large files go through
+    :func:`_read_input_text` so they are mmapped.
 
-    if not data.get("entries"):
-        return text
+    Args:
+        path: Path to the file to read.
+        size: File size in bytes, as reported by ``DirEntry.stat()``.
 
-    reverse = store.get_reverse_lookup()
+    Returns:
+        The decoded file contents, with line endings normalized.
+    """
+    if size >= _MMAP_MIN_BYTES:
+        return _read_input_text(path)
 
-    # Sort pseudonyms by length descending to handle substring cases
-    # (e.g., "Person_AA" before "Person_A")
-    sorted_pseudonyms = sorted(reverse.keys(), key=len, reverse=True)
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        # Normally the first read returns the whole file and the second EOF
+        chunks = []
+        while chunk := os.read(fd, max(size, _READ_CHUNK_BYTES)):
+            chunks.append(chunk)
+    finally:
+        os.close(fd)
+    return _normalize_newlines(b"".join(chunks).decode("utf-8"))
 
-    result = text
-    for pseudonym in sorted_pseudonyms:
-        real_name = reverse[pseudonym]
-        result = result.replace(pseudonym, real_name)
 
-    return result
+def _normalize_newlines(text: str) -> str:
+    """Convert CRLF and lone CR line endings to LF."""
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
 
 
 def _default_output_dir() -> Path:
@@ -162,15 +364,71 @@ def anonymize_file(
     if not input_path.exists():
         raise FileNotFoundError(f"Input file not found: {input_path}")
 
-    if input_path.suffix not in _SUPPORTED_EXTENSIONS:
+    _check_supported(input_path)
+
+    # Read input
+    text = _read_input_text(input_path)
+
+    return _anonymize_to_file(
+        text, input_path, output_path, mapping_id, base_dir, use_ollama
+    )
+
+
+def anonymize_bytes(
+    data: bytes,
+    filename: str,
+    output_path: str | Path | None = None,
+    mapping_id: str | None = None,
+    base_dir: Path | None = None,
+    use_ollama: bool = False,
+) -> dict:
+    """Anonymize in-memory file contents (e.g. an upload) and write the result.
+
+    Behaves like anonymize_file without the input ever touching disk.
+
+    Args:
+        data: Raw UTF-8 file contents.
+        filename: Original file name, used for the type check and defaults.
+        output_path: Path for the output file. Auto-generated if None.
+        mapping_id: Mapping ID to use. Auto-generated if None.
+        base_dir: Override base directory for mapping storage.
+        use_ollama: Whether to use Ollama for entity verification.
+
+    Returns:
+        Dict with keys: output_path, mapping_id, entities_found.
+    """
+    name = Path(filename)
+    _check_supported(name)
+
+    text = _normalize_newlines(data.decode("utf-8"))
+
+    return _anonymize_to_file(
+        text, name, output_path, mapping_id, base_dir, use_ollama
+    )
+
+
+def _check_supported(path: Path) -> None:
+    """Raise ValueError unless the file has a supported extension."""
+    if path.suffix not in _SUPPORTED_EXTENSIONS:
         raise ValueError(
-            f"Unsupported file type: {input_path.suffix}. "
+            f"Unsupported file type: {path.suffix}. "
             f"Supported: {', '.join(_SUPPORTED_EXTENSIONS)}"
         )
 
-    # Read input
-    text = input_path.read_text(encoding="utf-8")
 
+def _anonymize_to_file(
+    text: str,
+    input_path: Path,
+    output_path: str | Path | None,
+    mapping_id: str | None,
+    base_dir: Path | None,
+    use_ollama: bool,
+) -> dict:
+    """Anonymize text read from input_path and write it to the output file.
+
+    Returns:
+        Dict with keys: output_path, mapping_id, entities_found.
+    """
     # Generate defaults
     if mapping_id is None:
         mapping_id = _generate_mapping_id(input_path)
@@ -220,7 +478,7 @@ def deanonymize_file(
         raise FileNotFoundError(f"Input file not found: {input_path}")
 
     # Read input
-    text = input_path.read_text(encoding="utf-8")
+    text = _read_input_text(input_path)
 
     # Generate output path
     if output_path is None:
@@ -246,20 +504,144 @@ def deanonymize_file(
     }
 
 
-def _get_file_creation_time(path: Path) -> float:
+def _get_file_creation_time_ns(path: Path | os.DirEntry) -> int:
+    """Get file creation time in integer nanoseconds.
+
+    Uses the birth time where the platform reports one (macOS, Windows)
+    and falls back to ctime elsewhere. Integer nanoseconds sort exactly,
+    so files created within the same microsecond keep a stable order.
+
+    Args:
+        path: Path to the file, or a scandir entry (whose stat is cached).
+
+    Returns:
+        Creation timestamp in nanoseconds since the epoch.
+    """
+    stat = path.stat()
+    birthtime_ns = getattr(stat, "st_birthtime_ns", None)
+    if birthtime_ns is not None:
+        return birthtime_ns
+    birthtime = getattr(stat, "st_birthtime", None)  # macOS before Python 3.12
+    if birthtime is not None:
+        return int(birthtime * 1e9)
+    return stat.st_ctime_ns  # Linux fallback
+
+
+def _get_file_creation_time(path: Path | os.DirEntry) -> float:
     """Get file creation time (birth time on macOS, ctime fallback elsewhere).
 
     Args:
-        path: Path to the file.
+        path: Path to the file, or a scandir entry (whose stat is cached).
 
     Returns:
         Creation timestamp as a float (seconds since epoch).
     """
-    stat = path.stat()
+    return _get_file_creation_time_ns(path) / 1e9
+
+
+def _iter_supported(folder: Path):
+    """Yield scandir entries for the supported files directly inside folder.
+
+    The extension is checked on the name first, so unsupported entries are
+    skipped without is_file() ever needing a stat call.
+    """
+    with os.scandir(folder) as it:
+        for entry in it:
+            name = entry.name
+            dot = name.rfind(".")
+            # dot > 0: like Path.suffix, a leading dot starts a name, not a suffix
+            if dot > 0 and name[dot:] in _SUPPORTED_EXTENSIONS and entry.is_file():
+                yield entry
+
+
+def _detect_workers(num_files: int, total_bytes: int) -> int:
+    """Choose how many processes anonymize_folder uses for entity detection.
+
+    Defaults to the CPU count capped at _MAX_DETECT_WORKERS;
+    ANONTOOL_DETECT_WORKERS overrides that (1 disables the pool). Work of
+    fewer than _PARALLEL_MIN_FILES files or _PARALLEL_MIN_BYTES bytes stays
+    serial.
+    """
+    if num_files < _PARALLEL_MIN_FILES or total_bytes < _PARALLEL_MIN_BYTES:
+        return 1
+    default = min(os.cpu_count() or 1, _MAX_DETECT_WORKERS)
+    workers = detect_workers_override() or default
+    return max(1, min(workers, num_files))
+
+
+@dataclass
+class _FolderFile:
+    """A file being processed by anonymize_folder."""
+
+    path: Path
+    created_ns: int
+    size: int
+    mtime_ns: int
+    text: str = ""
+    entities: list[DetectedEntity] = field(default_factory=list)
+
+
+def _detect_batched(
+    files: list[_FolderFile],
+    failed_files: list[tuple[str, str]],
+    n_process: int | None = None,
+) -> list[_FolderFile]:
+    """Detect entities for already-read files in one batched spaCy pass.
+
+    If the batch fails, each file is retried on its own so the error is
+    reported against the file(s) that caused it and the rest still go through.
+    n_process is passed on to spaCy; 1 keeps detection in this process.
+
+    Returns:
+        The files whose detection succeeded, with entities filled in.
+    """
+    if not files:
+        return []
+
     try:
-        return stat.st_birthtime  # macOS
-    except AttributeError:
-        return stat.st_ctime  # Linux/Windows fallback
+        batch = detect_entities_batch([f.text for f in files], n_process=n_process)
+    except Exception:  # noqa: BLE001 - any failure is retried per file below
+        batch = None
+
+    if batch is not None:
+        for folder_file, entities in zip(files, batch):
+            folder_file.entities = entities
+        return files
+
+    succeeded: list[_FolderFile] = []
+    for folder_file in files:
+        try:
+            folder_file.entities = detect_entities(folder_file.text, n_process=n_process)
+            succeeded.append(folder_file)
+        except Exception as exc:  # noqa: BLE001 - one bad file must not stop the folder
+            failed_files.append((folder_file.path.name, str(exc)))
+    return succeeded
+
+
+def _detect_in_pool(
+    files: list[_FolderFile], workers: int, failed_files: list[tuple[str, str]]
+) -> list[_FolderFile]:
+    """Detect entities for already-read files across worker processes.
+
+    Workers are spawned rather than forked, so a threaded caller (such as
+    the web server) never forks while another thread holds a lock.
+
+    Returns:
+        The files whose detection succeeded, with entities filled in.
+    """
+    succeeded: list[_FolderFile] = []
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        # The pool already uses the cores; spaCy must not fork again inside it
+        futures = [pool.submit(detect_entities, f.text, n_process=1) for f in files]
+        for folder_file, future in zip(files, futures):
+            try:
+                folder_file.entities = future.result()
+                succeeded.append(folder_file)
+            except Exception as exc:  # noqa: BLE001 - a worker's error is reported per file
+                failed_files.append((folder_file.path.name, str(exc)))
+    return succeeded
 
 
 @dataclass
@@ -272,6 +654,7 @@ class BulkAnonymizeResult:
     files_failed: int
     total_entities: int
     failed_files: list[tuple[str, str]] = field(default_factory=list)
+    cache_hits: int = 0
 
 
 def anonymize_folder(
@@ -281,6 +664,9 @@ def anonymize_folder(
     base_dir: Path | None = None,
     use_ollama: bool = False,
     progress_callback: callable | None = None,
+    use_cache: bool = True,
+    fsync_output: bool = False,
+    parallel: bool = True,
 ) -> BulkAnonymizeResult:
     """Anonymize all supported files in a folder into a single merged output.
 
@@ -294,6 +680,11 @@ def anonymize_folder(
         base_dir: Override base directory for mapping storage.
         use_ollama: Whether to use Ollama for entity verification.
         progress_callback: Optional callable(current, total, filename) for progress.
+        use_cache: Reuse detection results for files unchanged since a previous
+            run, from the cache in base_dir.
+        fsync_output: fsync the merged output before returning.
+        parallel: Allow entity detection in worker processes for large
+            folders. False keeps detection in the calling process.
 
     Returns:
         BulkAnonymizeResult with processing summary.
@@ -310,17 +701,23 @@ def anonymize_folder(
     if not folder_path.is_dir():
         raise ValueError(f"Not a directory: {folder_path}")
 
-    # Collect supported files
+    # Collect supported files, stat-ing each one once via its scandir entry
+    # (DirEntry caches the stat, so the size below costs no extra syscall)
     supported_files = [
-        f for f in folder_path.iterdir()
-        if f.is_file() and f.suffix in _SUPPORTED_EXTENSIONS
+        _FolderFile(
+            Path(entry.path),
+            _get_file_creation_time_ns(entry),
+            entry.stat().st_size,
+            entry.stat().st_mtime_ns,
+        )
+        for entry in _iter_supported(folder_path)
     ]
 
     if not supported_files:
         raise ValueError(f"No supported files found in {folder_path}")
 
     # Sort by creation date (oldest first)
-    supported_files.sort(key=_get_file_creation_time)
+    supported_files.sort(key=lambda f: f.created_ns)
 
     # Generate defaults
     if mapping_id is None:
@@ -334,38 +731,118 @@ def anonymize_folder(
         output_path = Path(output_path)
 
     # Process each file
-    sections: list[str] = []
     total_entities = 0
     files_processed = 0
     failed_files: list[tuple[str, str]] = []
     total = len(supported_files)
 
-    for i, file_path in enumerate(supported_files, start=1):
-        if progress_callback:
-            progress_callback(i, total, file_path.name)
-
+    # Read every file and detect its entities first — in parallel worker
+    # processes for larger folders — so Ollama verification (if enabled) can
+    # check the whole folder in a few batched requests. Files unchanged since
+    # a previous run reuse their cached entities. Pseudonyms are assigned
+    # serially afterwards, in sorted order, so shared names stay consistent.
+    cache = DetectionCache(base_dir) if use_cache else None
+    model_ver = detector_version()
+
+    read_files: list[_FolderFile] = []
+    cached: list[_FolderFile] = []
+    misses: list[_FolderFile] = []
+    for folder_file in supported_files:
         try:
-            text = file_path.read_text(encoding="utf-8")
-            result = anonymize_text(
-                text, mapping_id, base_dir=base_dir, use_ollama=use_ollama
+            folder_file.text = _read_text_fast(folder_file.path, folder_file.size)
+        except (OSError, UnicodeDecodeError) as exc:
+            failed_files.append((folder_file.path.name, str(exc)))
+            continue
+        read_files.append(folder_file)
+
+        entities = (
+            cache.get(
+                folder_file.path,
+                folder_file.size,
+                folder_file.mtime_ns,
+                folder_file.text,
+                model_ver,
             )
+            if cache
+            else None
+        )
+        if entities is not None:
+            folder_file.entities = entities
+            cached.append(folder_file)
+        else:
+            misses.append(folder_file)
+
+    # Only the files left to detect decide whether a pool pays for itself
+    workers = (
+        _detect_workers(len(misses), sum(f.size for f in misses)) if parallel else 1
+    )
+    if workers > 1:
+        fresh = _detect_in_pool(misses, workers, failed_files)
+    else:
+        # Detection for the serial path runs batched across the whole folder;
+        # parallel=False also keeps spaCy from starting worker processes
+        fresh = _detect_batched(misses, failed_files, None if parallel else 1)
+
+    if cache:
+        cache.put_many(
+            ((f.path, f.size, f.mtime_ns, f.text, f.entities) for f in fresh),
+            model_ver,
+        )
+        cache.close()
 
-            # Build section with header
-            creation_ts = _get_file_creation_time(file_path)
-            created_date = datetime.fromtimestamp(
-                creation_ts, tz=timezone.utc
-            ).strftime("%Y-%m-%d")
-            header = f"=== {file_path.name} (Created: {created_date}) ==="
+    # Keep the folder's sorted order for pseudonym assignment
+    succeeded = {id(f) for f in cached} | {id(f) for f in fresh}
+    detected = [f for f in read_files if id(f) in succeeded]
 
-            sections.append(f"{header}\n\n{result.anonymized_text}")
-            total_entities += len(result.entities_found)
-            files_processed += 1
-        except Exception as exc:
-            failed_files.append((file_path.name, str(exc)))
+    if use_ollama and detected:
+        verified = _verify_batch_with_ollama(
+            [(f.text, f.entities) for f in detected]
+        )
+        for folder_file, entities in zip(detected, verified):
+            folder_file.entities = entities
 
-    # Write merged output
+    # Write each section as soon as it is anonymized, so the merged output
+    # is never held in memory all at once. Text mode, like the write_text()
+    # used for every other output, so line endings follow the platform.
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text("\n\n".join(sections), encoding="utf-8")
+    with open(
+        output_path, "w", encoding="utf-8", buffering=_OUTPUT_BUFFER_BYTES
+    ) as out:
+        for i, folder_file in enumerate(supported_files, start=1):
+            # Files that failed to read or detect were already reported
+            if id(folder_file) in succeeded:
+                try:
+                    result = _pseudonymize(
+                        folder_file.text, folder_file.entities, mapping_id, base_dir
+                    )
+                except Exception as exc:  # noqa: BLE001 - one bad file must not stop the folder
+                    failed_files.append((folder_file.path.name, str(exc)))
+                    result = None
+                finally:
+                    folder_file.text = ""  # Release the input text early
+
+                if result is not None:
+                    # Build section with header
+                    created_date = datetime.fromtimestamp(
+                        folder_file.created_ns / 1e9, tz=timezone.utc
+                    ).strftime("%Y-%m-%d")
+                    name = folder_file.path.name
+                    header = f"=== {name} (Created: {created_date}) ==="
+
+                    if files_processed:
+                        out.write("\n\n")
+                    out.write(f"{header}\n\n")
+                    out.write(result.anonymized_text)
+                    total_entities += len(result.entities_found)
+                    files_processed += 1
+
+            # Report each file once all of its work is done, in sorted order
+            if progress_callback:
+                progress_callback(i, total, folder_file.path.name)
+
+        if fsync_output:
+            out.flush()
+            os.fsync(out.fileno())
 
     return BulkAnonymizeResult(
         output_path=str(output_path),
@@ -374,4 +851,5 @@ def anonymize_folder(
         files_failed=len(failed_files),
         total_entities=total_entities,
         failed_files=failed_files,
+        cache_hits=len(cached),
     )
@@ -0,0 +1,155 @@
+"""On-disk cache of entity detection results for bulk folder runs."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+from collections.abc import Iterable
+from pathlib import Path
+
+from app.services import jsonio
+from app.services.detector import DetectedEntity
+from app.services.mapping_store import _default_base_dir
+
+logger = logging.getLogger(__name__)
+
+_CACHE_FILENAME = "detect_cache.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    model_ver TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    entities BLOB NOT NULL
+)
+"""
+
+
+def _digest(text: str) -> str:
+    """Return a short content hash of a file's decoded text."""
+    return hashlib.blake2b(
+        text.encode("utf-8", "surrogatepass"), digest_size=16
+    ).hexdigest()
+
+
+def _encode_entities(entities: list[DetectedEntity]) -> bytes:
+    return jsonio.dumps(
+        [
+            [e.text, e.entity_type, e.start, e.end, e.confidence, e.source]
+            for e in entities
+        ]
+    )
+
+
+def _decode_entities(data: bytes) -> list[DetectedEntity]:
+    return [DetectedEntity(*row) for row in jsonio.loads(data)]
+
+
+class DetectionCache:
+    """SQLite-backed cache of detected entities, one row per file path.
+
+    A cached result is only returned when the file's size, mtime, content
+    hash and the detector version all match what was stored, so edited
+    files and detector upgrades are re-detected. The cache is best-effort:
+    any SQLite error is logged and treated as a miss.
+
+    Rows hold the detected entity texts (names, emails, phones) in
+    plaintext, next to the mapping files that hold the same values.
+    """
+
+    def __init__(self, base_dir: Path | None = None) -> None:
+        """Initialize the cache.
+
+        Args:
+            base_dir: Root directory for AnonTool data. Defaults to ~/.anontool.
+        """
+        self._path = (base_dir or _default_base_dir()) / _CACHE_FILENAME
+        self._conn: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self._path)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(_SCHEMA)
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self._conn = conn
+        return self._conn
+
+    def get(
+        self, path: Path, size: int, mtime_ns: int, text: str, model_ver: str
+    ) -> list[DetectedEntity] | None:
+        """Look up the cached entities for a file.
+
+        Args:
+            path: Path of the file.
+            size: File size in bytes.
+            mtime_ns: File modification time in nanoseconds.
+            text: The file's decoded text (hashed to confirm the match).
+            model_ver: Detector version the result must have come from.
+
+        Returns:
+            The cached entities, or None on a miss.
+        """
+        try:
+            row = self._connect().execute(
+                "SELECT size, mtime_ns, model_ver, digest, entities"
+                " FROM detections WHERE path = ?",
+                (str(path),),
+            ).fetchone()
+        except (sqlite3.Error, OSError) as exc:
+            logger.warning("Detection cache lookup failed: %s", exc)
+            return None
+
+        if row is None or row[:3] != (size, mtime_ns, model_ver):
+            return None
+        if row[3] != _digest(text):
+            return None
+        return _decode_entities(row[4])
+
+    def put_many(
+        self,
+        items: Iterable[tuple[Path, int, int, str, list[DetectedEntity]]],
+        model_ver: str,
+    ) -> None:
+        """Store detection results for several files in one transaction.
+
+        Args:
+            items: (path, size, mtime_ns, text, entities) for each file.
+            model_ver: Detector version that produced the entities.
+        """
+        rows = [
+            (
+                str(path),
+                size,
+                mtime_ns,
+                model_ver,
+                _digest(text),
+                _encode_entities(entities),
+            )
+            for path, size, mtime_ns, text, entities in items
+        ]
+        if not rows:
+            return
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO detections VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        except (sqlite3.Error, OSError) as exc:
+            logger.warning("Detection cache update failed: %s", exc)
+
+    def close(self) -> None:
+        """Close the underlying database connection, if open."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -2,34 +2,107 @@
 
 from __future__ import annotations
 
+import functools
+import importlib.metadata
+import os
 import re
+import threading
 from dataclasses import dataclass
 
-import spacy
+try:
+    import hyperscan
+except ImportError:  # Optional — the regex pass runs unconditionally without it
+    hyperscan = None
 
-# Load spaCy model once at module level
-_nlp = spacy.load("en_core_web_sm")
+# Only NER output (doc.ents) is used, so skip constructing the components
+# that NER doesn't depend on (NER only needs tok2vec + ner).
+_EXCLUDED_COMPONENTS = ["tagger", "parser", "attribute_ruler", "lemmatizer"]
+
+_SPACY_MODEL = "en_core_web_sm"
+
+# Bump when detection logic changes so cached detection results are discarded
+_DETECTOR_REVISION = 1
+
+# spaCy model, loaded on first use by get_detector()
+_nlp = None
+_nlp_lock = threading.Lock()
+
+
+def get_detector():
+    """Return the shared spaCy pipeline, importing and loading it on first call.
+
+    Deferring the import keeps CLI commands that never run detection
+    (--help, list-mappings, show-mapping) from paying spaCy's load cost.
+    Concurrent first calls (e.g. web request threads) load it only once.
+    Call it up front to take the load cost before the first detection.
+    """
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                import spacy
+
+                _nlp = spacy.load(_SPACY_MODEL, exclude=_EXCLUDED_COMPONENTS)
+    return _nlp
+
+
+@functools.cache
+def detector_version() -> str:
+    """Return a version string identifying the detection logic and model.
+
+    Read from package metadata, so it doesn't require loading spaCy.
+    """
+    try:
+        model_ver = importlib.metadata.version(_SPACY_MODEL)
+    except importlib.metadata.PackageNotFoundError:
+        model_ver = "unknown"
+    return f"{_DETECTOR_REVISION}:{_SPACY_MODEL}-{model_ver}"
 
 # Regex patterns for PII types spaCy doesn't handle well
 EMAIL_PATTERN = re.compile(
     r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b"
 )
+# One branch per leading character (country code, "(", or digit) so the engine
+# never re-tries overlapping alternatives; this also keeps the separator before
+# a number out of the match.
 PHONE_PATTERN = re.compile(
     r"(?<!\d)"  # no digit before
-    r"(?:"
-    r"\(\d{3}\)\s*\d{3}[.\-\s]?\d{4}"  # (555) 123-4567
-    r"|"
-    r"\d{3}[.\-\s]\d{3}[.\-\s]\d{4}"  # 555-123-4567 / 555.123.4567
-    r"|"
-    r"\+?1?[\s.-]?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}"  # +1 555 123 4567
+    r"(?:\+1?[\s.-]?|1[\s.-]?)?"  # optional country code: +1 / + / 1-
+    r"(?:"  # area code and separator:
+    r"\(\d{3}(?:\)(?:\s*|[.-])|[\s.-]?)"  # (555) / (555)- / (555
+    r"|\d{3}\)?[\s.-]?"  # 555- / 555) / 555
     r")"
+    r"\d{3}[\s.-]?\d{4}"  # 123-4567 / 123.4567 / 1234567
     r"(?!\d)"  # no digit after
 )
+# Both patterns in one alternation so the text is scanned once;
+# m.lastgroup names the entity type that matched
+_REGEX_PATTERN = re.compile(
+    rf"(?P<EMAIL>{EMAIL_PATTERN.pattern})|(?P<PHONE>{PHONE_PATTERN.pattern})"
+)
+_REGEX_CONFIDENCE = {"EMAIL": 0.95, "PHONE": 0.90}
+
+# Context checks used by _is_inside_email: an "@" with no whitespace between
+# it and the entity, and a ".tld" right after the entity
+_EMAIL_BEFORE_RE = re.compile(r"@\S*\Z")
+_TLD_AFTER_RE = re.compile(r"\.[A-Za-z]{2,}\b")
+_ASCII_UPPER_RE = re.compile(r"[A-Z]")
+_WHITESPACE_RE = re.compile(r"\s")
+
+# Hyperscan prefilter database for the patterns above, compiled on first use
+_hs_database = None
+_hs_lock = threading.Lock()
+# Per-thread Hyperscan scratch space: a scratch serves one scan at a time,
+# and web request threads scan concurrently
+_hs_local = threading.local()
 
 
-@dataclass
+@dataclass(slots=True)
 class DetectedEntity:
-    """A detected entity in text with its location and metadata."""
+    """A detected entity in text with its location and metadata.
+
+    Slotted: the detector creates one per match, thousands per bulk run.
+    """
 
     text: str
     entity_type: str  # PERSON, ORG, EMAIL, PHONE
@@ -39,30 +112,89 @@ class DetectedEntity:
     source: str  # "regex", "spacy"
 
 
+def _get_hs_database():
+    """Return the Hyperscan database for the email/phone patterns, compiling once.
+
+    The patterns use lookarounds Hyperscan can't match exactly, so they are
+    compiled in prefilter mode: it may report extra candidates but never
+    misses text the real patterns would match.
+    """
+    global _hs_database
+    if _hs_database is None:
+        with _hs_lock:
+            if _hs_database is None:
+                flags = (
+                    hyperscan.HS_FLAG_PREFILTER
+                    | hyperscan.HS_FLAG_UTF8
+                    | hyperscan.HS_FLAG_UCP
+                )
+                db = hyperscan.Database()
+                db.compile(
+                    expressions=[
+                        EMAIL_PATTERN.pattern.encode(),
+                        PHONE_PATTERN.pattern.encode(),
+                    ],
+                    ids=[0, 1],
+                    elements=2,
+                    flags=[flags, flags],
+                )
+                _hs_database = db
+    return _hs_database
+
+
+def _get_hs_scratch(db):
+    """Return this thread's Hyperscan scratch space for db, allocating once."""
+    scratch = getattr(_hs_local, "scratch", None)
+    if scratch is None:
+        scratch = hyperscan.Scratch(db)
+        _hs_local.scratch = scratch
+    return scratch
+
+
+def _may_contain_regex_pii(text: str) -> bool:
+    """Cheaply check whether text could contain an email or phone number.
+
+    Uses a SIMD Hyperscan scan that stops at the first candidate. Returns True
+    whenever the answer isn't a definite no (hyperscan not installed, text
+    that can't be encoded as UTF-8, or any Hyperscan error).
+    """
+    if hyperscan is None:
+        return True
+    try:
+        data = text.encode("utf-8")
+    except UnicodeEncodeError:
+        return True
+
+    def on_match(*_args) -> bool:
+        return True  # Stop at the first candidate
+
+    try:
+        db = _get_hs_database()
+        db.scan(data, match_event_handler=on_match, scratch=_get_hs_scratch(db))
+    except hyperscan.error:
+        # ScanTerminated (a candidate was found) or a Hyperscan failure; either
+        # way the regex pass has to run
+        return True
+    return False
+
+
 def _detect_regex(text: str) -> list[DetectedEntity]:
     """Detect emails and phone numbers using regex patterns."""
     entities: list[DetectedEntity] = []
-
-    for match in EMAIL_PATTERN.finditer(text):
-        entities.append(
+    if not _may_contain_regex_pii(text):
+        return entities
+
+    append = entities.append
+    for match in _REGEX_PATTERN.finditer(text):
+        entity_type = match.lastgroup
+        start, end = match.span()
+        append(
             DetectedEntity(
-                text=match.group(),
-                entity_type="EMAIL",
-                start=match.start(),
-                end=match.end(),
-                confidence=0.95,
-                source="regex",
-            )
-        )
-
-    for match in PHONE_PATTERN.finditer(text):
-        entities.append(
-            DetectedEntity(
-                text=match.group(),
-                entity_type="PHONE",
-                start=match.start(),
-                end=match.end(),
-                confidence=0.90,
+                text=text[start:end],
+                entity_type=entity_type,
+                start=start,
+                end=end,
+                confidence=_REGEX_CONFIDENCE[entity_type],
                 source="regex",
             )
         )
@@ -70,82 +202,184 @@ def _detect_regex(text: str) -> list[DetectedEntity]:
     return entities
 
 
+@functools.lru_cache(maxsize=2048)
 def _estimate_confidence(text: str) -> float:
     """Estimate confidence for a spaCy NER detection.
 
     Multi-word entities get higher confidence than single-word ones.
+    Cached, since the same names recur throughout a document.
     """
-    words = text.strip().split()
-    if len(words) >= 2:
+    stripped = text.strip()
+    if not stripped:
+        return 0.60
+    # Checking for an inner space first skips the regex for most names
+    if " " in stripped or _WHITESPACE_RE.search(stripped):
         return 0.90
-    if len(words) == 1 and text[0].isupper():
+    if text[0].isupper():
         return 0.80
     return 0.60
 
 
 _MAX_CHUNK_SIZE = 900_000  # Stay under spaCy's 1M limit with margin
+_DEFAULT_SPACY_BATCH_SIZE = 8
+_MULTIPROCESS_MIN_CHARS = 1_000_000  # Below this, IPC overhead outweighs the gain
+
+
+def _spacy_batch_size() -> int:
+    """Return the nlp.pipe() batch size from ANONTOOL_SPACY_BATCH_SIZE (default 8)."""
+    raw = os.environ.get("ANONTOOL_SPACY_BATCH_SIZE", "")
+    try:
+        size = int(raw) if raw else _DEFAULT_SPACY_BATCH_SIZE
+    except ValueError:
+        return _DEFAULT_SPACY_BATCH_SIZE
+    return size if size > 0 else _DEFAULT_SPACY_BATCH_SIZE
+
+
+def detect_workers_override() -> int | None:
+    """Return the ANONTOOL_DETECT_WORKERS process limit, or None if unset or invalid."""
+    raw = os.environ.get("ANONTOOL_DETECT_WORKERS", "")
+    try:
+        return max(1, int(raw)) if raw else None
+    except ValueError:
+        return None
 
 
-def _split_into_chunks(text: str) -> list[tuple[str, int]]:
+def _pick_n_process(text_length: int, num_chunks: int) -> int:
+    """Choose how many worker processes nlp.pipe() should use for one text.
+
+    Small inputs stay single-process; large multi-chunk inputs get one
+    process per chunk, capped at the number of spare CPU cores and at
+    ANONTOOL_DETECT_WORKERS when that is set.
+    """
+    if text_length <= _MULTIPROCESS_MIN_CHARS or num_chunks < 2:
+        return 1
+    cpu_count = os.cpu_count() or 1
+    n_process = max(1, min(cpu_count - 1, num_chunks))
+    override = detect_workers_override()
+    return min(n_process, override) if override else n_process
+
+
+def _split_into_chunks(text: str) -> list[tuple[int, int]]:
     """Split text into chunks at line boundaries, each under spaCy's limit.
 
+    Only offsets are returned, so callers can slice one chunk at a time
+    instead of holding a second copy of the whole document.
+
     Args:
         text: The full text to split.
 
     Returns:
-        List of (chunk_text, offset) tuples where offset is the
-        character position of the chunk start in the original text.
+        List of (start, end) character ranges covering the text in order.
     """
     if len(text) <= _MAX_CHUNK_SIZE:
-        return [(text, 0)]
+        return [(0, len(text))]
 
-    chunks: list[tuple[str, int]] = []
+    chunks: list[tuple[int, int]] = []
     start = 0
     while start < len(text):
         end = start + _MAX_CHUNK_SIZE
         if end >= len(text):
-            chunks.append((text[start:], start))
+            chunks.append((start, len(text)))
             break
-        # Find the last newline before the limit to split cleanly
+        # Find the last newline before the limit to split cleanly. rfind scans
+        # backward from the limit and stops at the first newline, so it only
+        # touches the tail of the final line — no newline index is needed.
         split_at = text.rfind("\n", start, end)
         if split_at <= start:
             # No newline found — split at the limit
             split_at = end
         else:
             split_at += 1  # Include the newline in this chunk
-        chunks.append((text[start:split_at], start))
+        chunks.append((start, split_at))
         start = split_at
 
     return chunks
 
 
-def _detect_ner(text: str) -> list[DetectedEntity]:
+def _detect_ner(text: str, n_process: int | None = None) -> list[DetectedEntity]:
     """Detect PERSON and ORG entities using spaCy NER.
 
     Automatically chunks large texts to stay within spaCy's character limit.
+    Chunks are batched through ``nlp.pipe()``; the batch size is read from
+    the ANONTOOL_SPACY_BATCH_SIZE env var. Large multi-chunk inputs are
+    spread across worker processes unless n_process says otherwise.
     """
-    chunks = _split_into_chunks(text)
-    entities: list[DetectedEntity] = []
+    return _detect_ner_batch([text], n_process)[0]
+
+
+def _detect_ner_batch(
+    texts: list[str], n_process: int | None = None
+) -> list[list[DetectedEntity]]:
+    """Detect PERSON and ORG entities in several texts with one spaCy pass.
 
-    for chunk_text, offset in chunks:
-        doc = _nlp(chunk_text)
+    The chunks of every text go through a single ``nlp.pipe()`` stream, so
+    many small documents (a folder of transcripts) share batches instead of
+    paying per-call pipeline overhead.
+
+    Args:
+        texts: The texts to scan.
+        n_process: Worker processes for ``nlp.pipe()``. None picks one
+            automatically: only a single text over _MULTIPROCESS_MIN_CHARS
+            is spread across processes; batches of texts stay in-process.
+
+    Returns:
+        One entity list per text, in input order, with offsets into that text.
+    """
+    # (text index, start, end) for every chunk of every text
+    chunks = [
+        (i, start, end)
+        for i, text in enumerate(texts)
+        for start, end in _split_into_chunks(text)
+    ]
+    results: list[list[DetectedEntity]] = [[] for _ in texts]
+    if not chunks:
+        return results
+
+    # Generator, so only the chunk spaCy is working on is materialized
+    slices = (texts[i][start:end] for i, start, end in chunks)
+
+    # Feed all chunks through nlp.pipe() so spaCy batches them in one pass
+    if n_process is None:
+        n_process = (
+            _pick_n_process(len(texts[0]), len(chunks)) if len(texts) == 1 else 1
+        )
+    # A single large text's chunks are each close to 1M characters, so hand
+    # spaCy's workers one chunk at a time rather than a batch of them
+    batch_size = 1 if n_process > 1 and len(texts) == 1 else _spacy_batch_size()
+    docs = get_detector().pipe(slices, batch_size=batch_size, n_process=n_process)
+    for doc, (i, offset, _) in zip(docs, chunks):
+        append = results[i].append
         for ent in doc.ents:
-            if ent.label_ not in ("PERSON", "ORG"):
+            label = ent.label_
+            if label not in ("PERSON", "ORG"):
                 continue
 
-            confidence = _estimate_confidence(ent.text)
-            entities.append(
+            ent_text = ent.text
+            append(
                 DetectedEntity(
-                    text=ent.text,
-                    entity_type=ent.label_,
+                    text=ent_text,
+                    entity_type=label,
                     start=ent.start_char + offset,
                     end=ent.end_char + offset,
-                    confidence=confidence,
+                    confidence=_estimate_confidence(ent_text),
                     source="spacy",
                 )
             )
 
-    return entities
+    return results
+
+
+def _has_uppercase(text: str) -> bool:
+    """Check whether text contains any uppercase letter (Unicode-aware).
+
+    Tries a fast ASCII search first; only non-ASCII text without an ASCII
+    capital pays for the full lowercase comparison.
+    """
+    if _ASCII_UPPER_RE.search(text):
+        return True
+    if text.isascii():
+        return False
+    return text.lower() != text
 
 
 def _is_inside_email(ent: DetectedEntity, text: str) -> bool:
@@ -162,8 +396,8 @@ def _is_inside_email(ent: DetectedEntity, text: str) -> bool:
     before = text[search_start : ent.start]
     after = text[ent.end : ent.end + 10]
 
-    has_at_before = "@" in before and " " not in before[before.rfind("@") :]
-    has_tld_after = re.match(r"\.[A-Za-z]{2,}\b", after) is not None
+    has_at_before = _EMAIL_BEFORE_RE.search(before) is not None
+    has_tld_after = _TLD_AFTER_RE.match(after) is not None
 
     return has_at_before and has_tld_after
 
@@ -171,35 +405,38 @@ def _is_inside_email(ent: DetectedEntity, text: str) -> bool:
 def _deduplicate(
     entities: list[DetectedEntity], text: str = ""
 ) -> list[DetectedEntity]:
-    """Remove overlapping entities, preferring longer matches with higher confidence."""
-    if not entities:
-        return []
+    """Remove overlapping entities, preferring longer matches with higher confidence.
+
+    Returns:
+        The kept entities, sorted by start position.
+    """
+    if len(entities) < 2:
+        # Nothing can overlap; only the inside-an-email check applies
+        return [e for e in entities if not (text and _is_inside_email(e, text))]
 
     # Sort by start position, then by length descending, then confidence descending
     sorted_ents = sorted(
         entities, key=lambda e: (e.start, -(e.end - e.start), -e.confidence)
     )
 
+    # Accepted entities never overlap and arrive in start order, so an entity
+    # overlaps one of them exactly when it starts before the last accepted end
     result: list[DetectedEntity] = []
+    last_end = -1
     for ent in sorted_ents:
         # Drop ORG/PERSON entities that are inside an email address
         if text and _is_inside_email(ent, text):
             continue
 
-        # Check if this entity overlaps with any already-accepted entity
-        overlaps = False
-        for accepted in result:
-            if ent.start < accepted.end and ent.end > accepted.start:
-                overlaps = True
-                break
-        if not overlaps:
+        if ent.start >= last_end:
             result.append(ent)
+            last_end = ent.end
 
     return result
 
 
 def detect_entities(
-    text: str, min_confidence: float = 0.65
+    text: str, min_confidence: float = 0.65, n_process: int | None = None
 ) -> list[DetectedEntity]:
     """Run the full detection pipeline: regex -> spaCy NER -> deduplicate -> filter.
 
@@ -207,6 +444,8 @@ def detect_entities(
         text: The text to scan for entities.
         min_confidence: Minimum confidence threshold. Single-word detections
             below this threshold are filtered out.
+        n_process: spaCy worker processes; None lets very large texts use
+            several, 1 keeps detection in the calling process.
 
     Returns:
         List of DetectedEntity objects sorted by start position.
@@ -214,19 +453,56 @@ def detect_entities(
     # Layer 1: Regex (emails, phones)
     regex_entities = _detect_regex(text)
 
-    # Layer 2: spaCy NER (PERSON, ORG)
-    ner_entities = _detect_ner(text)
+    # Layer 2: spaCy NER (PERSON, ORG) — skipped for text with no uppercase
+    # letters at all (logs, numeric tables), where the model has nothing to
+    # key on and the CNN pass would be wasted
+    ner_entities = _detect_ner(text, n_process) if _has_uppercase(text) else []
+
+    return _combine(text, regex_entities, ner_entities, min_confidence)
+
+
+def detect_entities_batch(
+    texts: list[str], min_confidence: float = 0.65, n_process: int | None = None
+) -> list[list[DetectedEntity]]:
+    """Run detect_entities over several texts, batching their spaCy NER pass.
 
+    Args:
+        texts: The texts to scan for entities.
+        min_confidence: Minimum confidence threshold (see detect_entities).
+        n_process: spaCy worker processes (see _detect_ner_batch).
+
+    Returns:
+        One sorted entity list per text, identical to calling
+        detect_entities on each text.
+    """
+    ner_indices = [i for i, text in enumerate(texts) if _has_uppercase(text)]
+    ner_results: list[list[DetectedEntity]] = [[] for _ in texts]
+    if ner_indices:
+        batch = _detect_ner_batch([texts[i] for i in ner_indices], n_process)
+        for i, entities in zip(ner_indices, batch):
+            ner_results[i] = entities
+
+    return [
+        _combine(text, _detect_regex(text), ner_entities, min_confidence)
+        for text, ner_entities in zip(texts, ner_results)
+    ]
+
+
+def _combine(
+    text: str,
+    regex_entities: list[DetectedEntity],
+    ner_entities: list[DetectedEntity],
+    min_confidence: float,
+) -> list[DetectedEntity]:
+    """Merge regex and NER detections: deduplicate, filter, sort by position."""
     # Combine and deduplicate
     all_entities = regex_entities + ner_entities
     deduped = _deduplicate(all_entities, text)
 
-    # Filter low-confidence single-word detections
-    filtered = [
+    # Filter low-confidence single-word detections. _deduplicate already
+    # returns entities in start order, which the filter preserves.
+    return [
         e
         for e in deduped
         if e.confidence >= min_confidence or len(e.text.split()) > 1
     ]
-
-    # Sort by start position for consistent output
-    return sorted(filtered, key=lambda e: e.start)
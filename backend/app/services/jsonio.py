@@ -0,0 +1,43 @@
+"""JSON encode/decode helpers backed by orjson when it is installed."""
+
+from __future__ import annotations
+
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional speedup — fall back to the stdlib encoder
+    orjson = None
+
+
+def loads(data: bytes | bytearray | memoryview | str):
+    """Parse a JSON document.
+
+    Args:
+        data: Raw JSON bytes (or text).
+
+    Returns:
+        The decoded Python object.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def dumps(obj, indent: bool = False) -> bytes:
+    """Serialize an object to UTF-8 JSON bytes.
+
+    Args:
+        obj: The object to serialize.
+        indent: Pretty-print with a two-space indent.
+
+    Returns:
+        The encoded JSON document.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(
+        obj, indent=2 if indent else None, ensure_ascii=False
+    ).encode("utf-8")
@@ -2,17 +2,34 @@
 
 from __future__ import annotations
 
-import json
+import functools
+import mmap
+import os
 import string
+import tempfile
+import threading
+from collections.abc import Callable
 from datetime import datetime, timezone
 from pathlib import Path
 
+from app.services import jsonio
+from app.services.replacer import build_replacer
+
+_MMAP_MIN_BYTES = 4 << 20  # Memory-map mapping files of 4 MiB and up
+
+# Process-wide stores shared by open_cached(), keyed by (base_dir, mapping_id)
+# in least- to most-recently-used order and evicted LRU past _STORE_CACHE_MAX
+_STORE_CACHE: dict[tuple[Path, str], MappingStore] = {}
+_STORE_CACHE_LOCK = threading.Lock()
+_STORE_CACHE_MAX = 32
+
 
 def _default_base_dir() -> Path:
     """Return the default AnonTool data directory (~/.anontool)."""
     return Path.home() / ".anontool"
 
 
+@functools.lru_cache(maxsize=4096)
 def _next_letter_label(index: int) -> str:
     """Convert a 0-based index to a letter label: 0->A, 25->Z, 26->AA, etc."""
     letters = string.ascii_uppercase
@@ -29,11 +46,42 @@ def _next_letter_label(index: int) -> str:
     return result
 
 
+def _load_json_file(path: Path, size: int) -> dict:
+    """Parse a mapping JSON file, memory-mapping it when it is large.
+
+    Large files are parsed straight from the mapped pages instead of being
+    copied into a bytes object first.
+
+    Args:
+        path: Path to the JSON file.
+        size: File size in bytes, as already known from stat().
+
+    Returns:
+        The decoded mapping data.
+    """
+    if size < _MMAP_MIN_BYTES:
+        return jsonio.loads(path.read_bytes())
+    with open(path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        view = memoryview(mm)
+        try:
+            return jsonio.loads(view)
+        finally:
+            view.release()
+
+
 class MappingStore:
     """Manages pseudonym mappings stored as JSON key files.
 
     Each mapping has a unique ID and stores the bidirectional relationship
     between real names and their pseudonyms.
+
+    Stores from open_cached() are shared between threads. Callers that make
+    several calls which must see one consistent mapping (look up pseudonyms,
+    replace, save) hold ``store.lock`` around them.
     """
 
     def __init__(self, base_dir: Path | None = None) -> None:
@@ -48,12 +96,95 @@ class MappingStore:
 
         self._mapping_id: str | None = None
         self._data: dict = {}
+        # Same object as self._data["entries"], mutated in place
+        self._entries: dict = {}
+        # Entries per entity type, kept in step with the entries dict so the
+        # next pseudonym index is a lookup rather than a scan
+        self._type_counts: dict[str, int] = {}
+        # (mtime_ns, size, inode) of the JSON file as of the last load/save
+        self._file_signature: tuple[int, int, int] | None = None
+        # pseudonym -> real name, built on first use and kept up to date as
+        # entries are added
+        self._reverse: dict[str, str] | None = None
+        # Compiled name->pseudonym and pseudonym->name replacers, rebuilt
+        # lazily after the entries change
+        self._replacer: Callable[[str], str] | None = None
+        self._reverse_replacer: Callable[[str], str] | None = None
+        # Guards the mapping state when the store is shared between threads
+        self._lock = threading.RLock()
+
+    @classmethod
+    def open_cached(
+        cls, mapping_id: str, base_dir: Path | None = None
+    ) -> MappingStore:
+        """Return a shared, loaded store for a mapping.
+
+        The same instance is handed out for a given (base_dir, mapping_id),
+        so the JSON is parsed once rather than per call. It is re-read only
+        when the file was changed on disk by another writer (see is_stale).
+        Hold ``store.lock`` while using the store across several calls.
+
+        Args:
+            mapping_id: Unique identifier for the mapping.
+            base_dir: Root directory for AnonTool data. Defaults to ~/.anontool.
+
+        Returns:
+            The cached MappingStore with the mapping loaded.
+        """
+        key = (base_dir or _default_base_dir(), mapping_id)
+        with _STORE_CACHE_LOCK:
+            store = _STORE_CACHE.pop(key, None)
+            created = store is None
+            if created:
+                store = cls(base_dir=key[0])
+                store.create_or_load(mapping_id)
+            # (Re)insert at the end, so the first key is the least recently used
+            _STORE_CACHE[key] = store
+            if len(_STORE_CACHE) > _STORE_CACHE_MAX:
+                del _STORE_CACHE[next(iter(_STORE_CACHE))]
+        if not created:
+            with store.lock:
+                if store.is_stale():
+                    store.create_or_load(mapping_id)
+        return store
 
     @property
     def mapping_id(self) -> str | None:
         """Return the current mapping ID."""
         return self._mapping_id
 
+    @property
+    def lock(self) -> threading.RLock:
+        """Return the re-entrant lock guarding this store's mapping state."""
+        return self._lock
+
+    @property
+    def mappings_dir(self) -> Path:
+        """Return the directory holding the mapping JSON files."""
+        return self._mappings_dir
+
+    def _path(self) -> Path:
+        """Return the JSON file path for the current mapping."""
+        return self._mappings_dir / f"{self._mapping_id}.json"
+
+    def _read_signature(self) -> tuple[int, int, int] | None:
+        """Stat the mapping file, returning None if it doesn't exist."""
+        try:
+            st = self._path().stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def is_stale(self) -> bool:
+        """Check whether the mapping file changed on disk since the last load/save.
+
+        Returns:
+            True if another writer has created, modified, or removed the file.
+        """
+        if not self._mapping_id:
+            return False
+        return self._read_signature() != self._file_signature
+
     def create_or_load(self, mapping_id: str) -> dict:
         """Load an existing mapping or create a new empty one.
 
@@ -64,11 +195,14 @@ class MappingStore:
             The mapping data dict.
         """
         self._mapping_id = mapping_id
-        path = self._mappings_dir / f"{mapping_id}.json"
-
-        if path.exists():
-            with open(path) as f:
-                self._data = json.load(f)
+        self._reverse = None
+        self._replacer = None
+        self._reverse_replacer = None
+        path = self._path()
+        self._file_signature = self._read_signature()
+
+        if self._file_signature is not None:
+            self._data = _load_json_file(path, self._file_signature[1])
         else:
             now = datetime.now(timezone.utc).isoformat()
             self._data = {
@@ -78,6 +212,12 @@ class MappingStore:
                 "entries": {},
             }
 
+        self._entries = self._data.setdefault("entries", {})
+        self._type_counts = {}
+        for entry in self._entries.values():
+            entry_type = entry["type"]
+            self._type_counts[entry_type] = self._type_counts.get(entry_type, 0) + 1
+
         return self._data
 
     def get_pseudonym(self, real_name: str, entity_type: str) -> str:
@@ -93,27 +233,29 @@ class MappingStore:
         Returns:
             The pseudonym string (e.g., "Person_A", "Company_1").
         """
-        entries = self._data.get("entries", {})
+        with self._lock:
+            entries = self._entries
 
-        # Check if already mapped
-        if real_name in entries:
-            return entries[real_name]["pseudonym"]
+            # Check if already mapped
+            if real_name in entries:
+                return entries[real_name]["pseudonym"]
 
-        # Count existing entries of this type to determine next index
-        existing_count = sum(
-            1 for e in entries.values() if e["type"] == entity_type
-        )
+            # Existing entries of this type determine the next index
+            existing_count = self._type_counts.get(entity_type, 0)
 
-        pseudonym = self._generate_pseudonym(entity_type, existing_count)
+            pseudonym = self._generate_pseudonym(entity_type, existing_count)
 
-        entries[real_name] = {
-            "pseudonym": pseudonym,
-            "type": entity_type,
-        }
-        self._data["entries"] = entries
-        self._data["updated"] = datetime.now(timezone.utc).isoformat()
+            entries[real_name] = {
+                "pseudonym": pseudonym,
+                "type": entity_type,
+            }
+            self._type_counts[entity_type] = existing_count + 1
+            if self._reverse is not None:
+                self._reverse[pseudonym] = real_name
+            self._replacer = None
+            self._reverse_replacer = None
 
-        return pseudonym
+            return pseudonym
 
     def _generate_pseudonym(self, entity_type: str, index: int) -> str:
         """Generate a pseudonym based on entity type and sequence index.
@@ -135,31 +277,81 @@ class MappingStore:
             return f"Phone_{index + 1}"
         return f"Entity_{index + 1}"
 
-    def save(self) -> Path:
+    def save(self, fsync: bool = False) -> Path:
         """Write the current mapping to its JSON file.
 
+        Args:
+            fsync: Flush the file to disk before it replaces the old one, so
+                the save also survives a power loss. Off by default, since
+                bulk runs save once per file.
+
         Returns:
             Path to the saved JSON file.
         """
-        if not self._mapping_id:
-            raise ValueError("No mapping loaded. Call create_or_load() first.")
-
-        self._data["updated"] = datetime.now(timezone.utc).isoformat()
-        path = self._mappings_dir / f"{self._mapping_id}.json"
-
-        with open(path, "w") as f:
-            json.dump(self._data, f, indent=2)
-
-        return path
+        with self._lock:
+            if not self._mapping_id:
+                raise ValueError("No mapping loaded. Call create_or_load() first.")
+
+            self._data["updated"] = datetime.now(timezone.utc).isoformat()
+            path = self._path()
+
+            # Write a uniquely named sibling temp file and rename it over the
+            # mapping, so a crash mid-save never leaves a truncated mapping
+            # behind and concurrent writers never share a temp file
+            data = jsonio.dumps(self._data, indent=True)
+            fd, tmp_name = tempfile.mkstemp(
+                dir=self._mappings_dir,
+                prefix=f".{self._mapping_id}.",
+                suffix=".tmp",
+            )
+            tmp_path = Path(tmp_name)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                    if fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
+            self._file_signature = self._read_signature()
+
+            return path
 
     def get_entries(self) -> dict:
         """Return the current mapping entries."""
-        return self._data.get("entries", {})
+        return self._entries
 
     def get_reverse_lookup(self) -> dict[str, str]:
-        """Build a reverse lookup: pseudonym -> real_name."""
-        entries = self._data.get("entries", {})
-        return {v["pseudonym"]: k for k, v in entries.items()}
+        """Return the reverse lookup: pseudonym -> real_name.
+
+        The dict is cached and shared between calls; treat it as read-only.
+        """
+        if self._reverse is None:
+            self._reverse = {v["pseudonym"]: k for k, v in self._entries.items()}
+        return self._reverse
+
+    def get_replacer(self) -> Callable[[str], str]:
+        """Return a function replacing every mapped real name with its pseudonym.
+
+        The compiled replacer is cached until a new entry is added.
+        """
+        if self._replacer is None:
+            entries = self._entries
+            self._replacer = build_replacer(
+                {name: info["pseudonym"] for name, info in entries.items()}
+            )
+        return self._replacer
+
+    def get_reverse_replacer(self) -> Callable[[str], str]:
+        """Return a function replacing every pseudonym with its real name.
+
+        The compiled replacer is cached until a new entry is added.
+        """
+        if self._reverse_replacer is None:
+            self._reverse_replacer = build_replacer(self.get_reverse_lookup())
+        return self._reverse_replacer
 
     def list_mappings(self) -> list[str]:
         """Return all available mapping IDs from the mappings directory."""
@@ -2,12 +2,16 @@
 
 from __future__ import annotations
 
+import dataclasses
 import json
 import logging
 import os
+import re
+import time
 
 import httpx
 
+from app.services import jsonio
 from app.services.detector import DetectedEntity
 
 logger = logging.getLogger(__name__)
@@ -15,6 +19,16 @@ logger = logging.getLogger(__name__)
 _DEFAULT_OLLAMA_URL = "http://localhost:11434"
 _DEFAULT_OLLAMA_MODEL = "llama3.1:8b"
 
+# One pooled client shared by every OllamaClient, so keep-alive connections to
+# the Ollama server survive across instances (per request, per file)
+_SHARED_CLIENT: httpx.Client | None = None
+
+# Availability probes: fail fast when Ollama is down, and remember the answer
+# per URL for a few seconds so per-file callers don't re-probe every time
+_PROBE_TIMEOUT = httpx.Timeout(1.0, connect=0.5)
+_AVAILABILITY_TTL = 10.0
+_availability_cache: dict[str, tuple[float, bool]] = {}
+
 _VERIFY_PROMPT = """You are a name verification assistant. Given a text and a list of detected entities, determine whether each entity is truly a person name, company/organization name, email, or phone number.
 
 Text:
@@ -30,6 +44,132 @@ For each entity, respond with a JSON array of objects, each with:
 
 Respond ONLY with the JSON array, no other text."""
 
+_VERIFY_BATCH_PROMPT = """You are a name verification assistant. Given several documents, each with a list of detected entities, determine whether each entity is truly a person name, company/organization name, email, or phone number.
+
+{documents}
+
+Respond with a JSON array containing one array per document, in the same order as the documents above. Each inner array holds one object per entity of that document, each with:
+- "text": the entity text
+- "is_valid": true if it's genuinely a name/email/phone, false if it's a false positive
+- "entity_type": the corrected type (PERSON, ORG, EMAIL, PHONE)
+
+Respond ONLY with the JSON array of arrays, no other text."""
+
+_BATCH_DOCUMENT = """Document {index}:
+Text:
+{text}
+
+Detected entities:
+{entities_json}"""
+
+# First "[" through last "]" — the array the prompts ask for, minus any
+# markdown fence or commentary around it
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+
+# Types the LLM may reassign an entity to
+_ENTITY_TYPES = frozenset({"PERSON", "ORG", "EMAIL", "PHONE"})
+
+# Upper bound on document text per batched request, so a large folder is
+# split into a few prompts rather than overflowing the model's context
+_BATCH_MAX_CHARS = 16_000
+
+
+def _entities_json(entities: list[DetectedEntity]) -> str:
+    """Render the entity list shown to the LLM in verification prompts."""
+    return jsonio.dumps(
+        [
+            {"text": e.text, "type": e.entity_type, "confidence": e.confidence}
+            for e in entities
+        ],
+        indent=True,
+    ).decode("utf-8")
+
+
+def _extract_json(llm_response: str) -> str:
+    """Cut the JSON array out of an LLM response.
+
+    Drops anything around the array, such as a markdown code fence or a line
+    of prose, in a single regex pass.
+    """
+    match = _JSON_ARRAY_RE.search(llm_response)
+    return match.group(0) if match else llm_response.strip()
+
+
+class _JsonArrayScanner:
+    """Track streamed LLM output until its top-level JSON array closes.
+
+    Brackets inside JSON strings are ignored, so entity texts such as
+    "Acme [UK]" don't end the array early.
+    """
+
+    def __init__(self) -> None:
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> int | None:
+        """Consume the next piece of output.
+
+        Returns:
+            The offset in chunk just past the bracket that closes the
+            outermost array, or None if the array is still open.
+        """
+        for i, ch in enumerate(chunk):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == "[":
+                self._depth += 1
+            elif self._depth:
+                if ch == '"':
+                    self._in_string = True
+                elif ch == "]":
+                    self._depth -= 1
+                    if self._depth == 0:
+                        return i + 1
+        return None
+
+
+def _group_for_batches(
+    items: list[tuple[str, list[DetectedEntity]]],
+) -> list[list[int]]:
+    """Group item indices into batches of at most _BATCH_MAX_CHARS of text.
+
+    Items without entities need no verification and are left out.
+    """
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_chars = 0
+    for i, (text, entities) in enumerate(items):
+        if not entities:
+            continue
+        if current and current_chars + len(text) > _BATCH_MAX_CHARS:
+            batches.append(current)
+            current, current_chars = [], 0
+        current.append(i)
+        current_chars += len(text)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _get_client() -> httpx.Client:
+    """Return the shared HTTP client, creating it on first use.
+
+    Timeouts are passed per request, so one client serves every
+    OllamaClient regardless of its configured timeout.
+    """
+    global _SHARED_CLIENT
+    if _SHARED_CLIENT is None:
+        _SHARED_CLIENT = httpx.Client(
+            limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=60),
+        )
+    return _SHARED_CLIENT
+
 
 class OllamaClient:
     """Client for optional Ollama LLM-based entity verification.
@@ -55,20 +195,33 @@ class OllamaClient:
         self._url = url or os.environ.get("OLLAMA_URL", _DEFAULT_OLLAMA_URL)
         self._model = model or os.environ.get("OLLAMA_MODEL", _DEFAULT_OLLAMA_MODEL)
         self._timeout = timeout
-        self._client = httpx.Client(timeout=self._timeout)
+        self._client = _get_client()
 
     def is_available(self) -> bool:
         """Check if Ollama is running and reachable.
 
+        The result is cached per URL for _AVAILABILITY_TTL seconds, and the
+        probe gives up after half a second if the server can't be reached.
+
         Returns:
             True if Ollama API responds, False otherwise.
         """
+        now = time.monotonic()
+        cached = _availability_cache.get(self._url)
+        if cached is not None and now - cached[0] < _AVAILABILITY_TTL:
+            return cached[1]
+
         try:
-            response = self._client.get(f"{self._url}/api/tags")
-            return response.status_code == 200
+            response = self._client.get(
+                f"{self._url}/api/tags", timeout=_PROBE_TIMEOUT
+            )
+            available = response.status_code == 200
         except (httpx.ConnectError, httpx.TimeoutException):
             logger.debug("Ollama not available at %s", self._url)
-            return False
+            available = False
+
+        _availability_cache[self._url] = (now, available)
+        return available
 
     def verify_entities(
         self, text: str, entities: list[DetectedEntity]
@@ -89,29 +242,13 @@ class OllamaClient:
         if not entities:
             return entities
 
-        entities_for_prompt = [
-            {"text": e.text, "type": e.entity_type, "confidence": e.confidence}
-            for e in entities
-        ]
-
         prompt = _VERIFY_PROMPT.format(
             text=text,
-            entities_json=json.dumps(entities_for_prompt, indent=2),
+            entities_json=_entities_json(entities),
         )
 
         try:
-            response = self._client.post(
-                f"{self._url}/api/generate",
-                json={
-                    "model": self._model,
-                    "prompt": prompt,
-                    "stream": False,
-                },
-            )
-            response.raise_for_status()
-
-            result = response.json()
-            llm_text = result.get("response", "")
+            llm_text = self._generate(prompt)
             verified = self._parse_verification(llm_text, entities)
             return verified
 
@@ -122,6 +259,124 @@ class OllamaClient:
             )
             return entities
 
+    def verify_entities_batch(
+        self, items: list[tuple[str, list[DetectedEntity]]]
+    ) -> list[list[DetectedEntity]]:
+        """Verify the entities of several documents with as few requests as possible.
+
+        Documents are packed into shared prompts (up to _BATCH_MAX_CHARS of
+        text each), so a folder costs a handful of LLM round trips rather
+        than one per file.
+
+        Args:
+            items: (text, entities) pairs, one per document.
+
+        Returns:
+            The filtered entity list for each document, in input order. A
+            document whose batch fails keeps its original entities.
+        """
+        results = [entities for _, entities in items]
+
+        for batch in _group_for_batches(items):
+            documents = "\n\n".join(
+                _BATCH_DOCUMENT.format(
+                    index=n,
+                    text=items[i][0],
+                    entities_json=_entities_json(items[i][1]),
+                )
+                for n, i in enumerate(batch, start=1)
+            )
+            prompt = _VERIFY_BATCH_PROMPT.format(documents=documents)
+
+            try:
+                llm_text = self._generate(prompt)
+            except Exception:
+                logger.warning(
+                    "Ollama batch verification failed, using original detections",
+                    exc_info=True,
+                )
+                continue
+
+            verified = self._parse_batch_verification(
+                llm_text, [items[i][1] for i in batch]
+            )
+            for i, entities in zip(batch, verified):
+                results[i] = entities
+
+        return results
+
+    def _generate(self, prompt: str) -> str:
+        """Run a prompt through the model and return its response text.
+
+        The response is streamed and reading stops once the JSON array the
+        prompts ask for has closed, rather than waiting for generation to end.
+
+        Raises:
+            httpx.HTTPError: If the request fails.
+        """
+        parts: list[str] = []
+        scanner = _JsonArrayScanner()
+        with self._client.stream(
+            "POST",
+            f"{self._url}/api/generate",
+            content=jsonio.dumps({
+                "model": self._model,
+                "prompt": prompt,
+                "stream": True,
+            }),
+            headers={"Content-Type": "application/json"},
+            timeout=self._timeout,
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = jsonio.loads(line)
+                delta = chunk.get("response", "")
+                # Stop as soon as the answer's JSON array is complete; closing
+                # the stream lets Ollama stop generating trailing text
+                end = scanner.feed(delta)
+                if end is not None:
+                    parts.append(delta[:end])
+                    break
+                parts.append(delta)
+                if chunk.get("done"):
+                    break
+        return "".join(parts)
+
+    def _parse_batch_verification(
+        self,
+        llm_response: str,
+        original_lists: list[list[DetectedEntity]],
+    ) -> list[list[DetectedEntity]]:
+        """Parse a batched response: one verification array per document.
+
+        Args:
+            llm_response: Raw text response from the LLM.
+            original_lists: Each document's original entities, in prompt order.
+
+        Returns:
+            Filtered entity lists. If the response can't be matched up with
+            the documents, the original lists are returned unchanged.
+        """
+        try:
+            verified_lists = jsonio.loads(_extract_json(llm_response))
+        except json.JSONDecodeError:
+            verified_lists = None
+
+        if (
+            not isinstance(verified_lists, list)
+            or len(verified_lists) != len(original_lists)
+            or not all(isinstance(v, list) for v in verified_lists)
+        ):
+            logger.debug("Could not parse Ollama batch response, keeping all entities")
+            return original_lists
+
+        return [
+            self._filter_entities(verified, original)
+            for verified, original in zip(verified_lists, original_lists)
+        ]
+
     def _parse_verification(
         self, llm_response: str, original_entities: list[DetectedEntity]
     ) -> list[DetectedEntity]:
@@ -135,27 +390,50 @@ class OllamaClient:
             Filtered entity list based on LLM verification.
         """
         try:
-            # Try to extract JSON from the response
-            text = llm_response.strip()
-            # Handle cases where LLM wraps in markdown code blocks
-            if "```" in text:
-                start = text.find("[")
-                end = text.rfind("]") + 1
-                if start >= 0 and end > start:
-                    text = text[start:end]
-
-            verified_list = json.loads(text)
-
-            # Build set of valid entity texts
-            valid_texts = {
-                item["text"]
-                for item in verified_list
-                if item.get("is_valid", True)
-            }
+            verified_list = jsonio.loads(_extract_json(llm_response))
+        except json.JSONDecodeError:
+            logger.debug("Could not parse Ollama response, keeping all entities")
+            return original_entities
+        return self._filter_entities(verified_list, original_entities)
 
-            # Filter original entities
-            return [e for e in original_entities if e.text in valid_texts]
+    def _filter_entities(
+        self, verified_list: list, original_entities: list[DetectedEntity]
+    ) -> list[DetectedEntity]:
+        """Keep the original entities the LLM's verification list marks valid.
+
+        Only entities the LLM explicitly marked invalid are dropped. Those it
+        left out are kept, so a truncated or sloppy answer never leaves PII
+        un-anonymized. A corrected "entity_type" is applied when it names a
+        known type.
+
+        Args:
+            verified_list: Decoded verification objects from the LLM.
+            original_entities: The original entity list for fallback.
 
-        except (json.JSONDecodeError, KeyError, TypeError):
+        Returns:
+            Filtered entity list, or the originals if the list is malformed.
+        """
+        try:
+            # Map each entity text to (is_valid, corrected type)
+            verdicts: dict[str, tuple[bool, str]] = {
+                item["text"]: (item.get("is_valid", True), item.get("entity_type", ""))
+                for item in verified_list
+            }
+        except (KeyError, TypeError, AttributeError):
             logger.debug("Could not parse Ollama response, keeping all entities")
             return original_entities
+
+        # Keep all but the rejected entities, applying any type correction
+        verified: list[DetectedEntity] = []
+        for e in original_entities:
+            verdict = verdicts.get(e.text)
+            if verdict is None:
+                verified.append(e)
+                continue
+            if not verdict[0]:
+                continue
+            corrected_type = verdict[1]
+            if corrected_type in _ENTITY_TYPES and corrected_type != e.entity_type:
+                e = dataclasses.replace(e, entity_type=corrected_type)
+            verified.append(e)
+        return verified
@@ -0,0 +1,92 @@
+"""Single-pass multi-string replacement for applying and reversing mappings."""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Callable
+
+try:
+    import ahocorasick
+except ImportError:  # Optional speedup — fall back to a regex sweep
+    ahocorasick = None
+
+
+def splice(text: str, replacements: list[tuple[int, int, str]]) -> str:
+    """Replace character spans in text in a single left-to-right pass.
+
+    Building the output from slices keeps the cost linear in the text length,
+    instead of copying the whole string once per replacement.
+
+    Args:
+        text: The original text.
+        replacements: (start, end, replacement) tuples sorted by start.
+            Spans overlapping an earlier span are skipped.
+
+    Returns:
+        The text with every span replaced.
+    """
+    parts: list[str] = []
+    cursor = 0
+    for start, end, replacement in replacements:
+        if start < cursor:
+            continue
+        parts.append(text[cursor:start])
+        parts.append(replacement)
+        cursor = end
+    parts.append(text[cursor:])
+    return "".join(parts)
+
+
+def build_replacer(replacements: dict[str, str]) -> Callable[[str], str]:
+    """Compile a function that replaces every key in one left-to-right scan.
+
+    At each position the longest matching key wins, and inserted replacement
+    text is never rescanned. The matcher is an Aho-Corasick automaton when
+    pyahocorasick is installed, otherwise a single regex alternation. Build
+    once and reuse the returned function for every text using the same
+    replacements.
+
+    Args:
+        replacements: Mapping of search string -> replacement string.
+
+    Returns:
+        A function taking a text and returning it with all keys replaced.
+    """
+    keys = [k for k in replacements if k]
+    if not keys:
+        return lambda text: text
+
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for key in keys:
+            automaton.add_word(key, (len(key), replacements[key]))
+        automaton.make_automaton()
+
+        def replace(text: str) -> str:
+            # iter() reports every (possibly overlapping) match; order them by
+            # start, longest first, and splice keeps the leftmost-longest ones
+            spans = sorted(
+                (
+                    (end + 1 - length, end + 1, replacement)
+                    for end, (length, replacement) in automaton.iter(text)
+                ),
+                key=lambda span: (span[0], span[0] - span[1]),
+            )
+            return splice(text, spans)
+
+        return replace
+
+    # Alternatives are tried in order, so longest-first gives the same
+    # leftmost-longest matching as the automaton
+    pattern = re.compile(
+        "|".join(re.escape(k) for k in sorted(keys, key=len, reverse=True))
+    )
+
+    def replace(text: str) -> str:
+        spans = [
+            (m.start(), m.end(), replacements[m.group()])
+            for m in pattern.finditer(text)
+        ]
+        return splice(text, spans)
+
+    return replace
@@ -2,17 +2,52 @@
 
 from __future__ import annotations
 
+import functools
 import tempfile
+import time
+from collections.abc import Iterable
 from pathlib import Path
+from typing import BinaryIO
 
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, Response, jsonify, request, render_template, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 
-from app.services.anonymizer import anonymize_file, anonymize_folder, deanonymize_file
+from app.services import jsonio
+from app.services.anonymizer import (
+    anonymize_bytes,
+    anonymize_folder,
+    deanonymize_file,
+)
 from app.services.mapping_store import MappingStore
 
+
+class _JsonioProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes and decodes with orjson via jsonio."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return jsonio.dumps(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return jsonio.loads(s)
+
+
 app = Flask(__name__)
+if jsonio.orjson is not None:
+    app.json = _JsonioProvider(app)
+
+_SUPPORTED_EXTENSIONS = frozenset({".txt", ".md"})
+_NDJSON_MIMETYPE = "application/x-ndjson"
+_NO_SUPPORTED_FILES = "No supported files (.txt, .md) found in upload"
 
-_SUPPORTED_EXTENSIONS = {".txt", ".md"}
+
+def _extension(filename: str) -> str:
+    """Return the lowercased extension of an upload's filename ("" if none).
+
+    Like Path.suffix, a leading dot starts a hidden name rather than a
+    suffix, so ".txt" has no extension.
+    """
+    dot = filename.rfind(".")
+    return filename[dot:].lower() if dot > 0 else ""
 
 
 @app.errorhandler(Exception)
@@ -21,27 +56,202 @@ def handle_error(e):
     return jsonify({"error": str(e)}), 500
 
 
+@functools.lru_cache(maxsize=1)
+def _default_output_dir() -> Path:
+    """Return ~/Downloads, creating it the first time it is needed."""
+    path = Path.home() / "Downloads"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
 def _resolve_output_dir(output_dir: str | None) -> Path:
     """Resolve the output directory, defaulting to ~/Downloads."""
-    if output_dir and output_dir.strip():
-        path = Path(output_dir).expanduser()
-    else:
-        path = Path.home() / "Downloads"
+    if not (output_dir and output_dir.strip()):
+        return _default_output_dir()
+    path = Path(output_dir).expanduser()
     path.mkdir(parents=True, exist_ok=True)
     return path
 
 
+def _anonymize_each(
+    uploads: list[tuple[str, bytes]],
+    output_dir: Path,
+    mapping_id: str | None,
+):
+    """Anonymize uploads one by one, yielding each file's result dict.
+
+    All files share one mapping: the first file's mapping ID is reused for
+    the rest when none was given.
+    """
+    for filename, data in uploads:
+        name = Path(filename)
+        out = output_dir / f"{name.stem}.anon{name.suffix}"
+        r = anonymize_bytes(
+            data,
+            filename,
+            output_path=out,
+            mapping_id=mapping_id,
+        )
+        # Reuse the mapping_id from the first file for consistency
+        if mapping_id is None:
+            mapping_id = r["mapping_id"]
+        yield r
+
+
+def _stream_ndjson(results):
+    """Encode each result as one NDJSON line, then a closing summary line.
+
+    An error stops the stream with an {"error": ...} line, since the status
+    code has already been sent.
+    """
+    count = 0
+    try:
+        for r in results:
+            count += 1
+            yield jsonio.dumps(r) + b"\n"
+    except Exception as e:  # noqa: BLE001 - like handle_error; the 200 is already sent
+        yield jsonio.dumps({"error": str(e)}) + b"\n"
+        return
+    yield jsonio.dumps({"files_processed": count}) + b"\n"
+
+
+def _read_uploads(
+    streams: Iterable[tuple[str | None, BinaryIO]],
+) -> list[tuple[str, bytes]]:
+    """Read the supported uploads into (filename, data) pairs, skipping the rest."""
+    return [
+        (filename, stream.read())
+        for filename, stream in streams
+        if filename and _extension(filename) in _SUPPORTED_EXTENSIONS
+    ]
+
+
+def _anonymize_uploads(
+    uploads: list[tuple[str, bytes]],
+    output_dir: Path,
+    mapping_id: str | None,
+    merge: bool,
+) -> dict:
+    """Anonymize read uploads and return the /anonymize JSON response body."""
+    if len(uploads) > 1 and merge:
+        # Bulk mode — merge into single output. anonymize_folder works on a
+        # directory, so only this branch stages the uploads on disk.
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            for filename, data in uploads:
+                (tmp / filename).write_bytes(data)
+
+            output_path = output_dir / "anonymized_merged.txt"
+            result = anonymize_folder(
+                folder_path=tmp,
+                output_path=output_path,
+                mapping_id=mapping_id,
+                # Staged paths are unique per request, so caching can't hit
+                use_cache=False,
+                # Keep detection in-process: the server is threaded, and an
+                # upload isn't worth starting spaCy worker processes for
+                parallel=False,
+            )
+        return {
+            "output_path": result.output_path,
+            "mapping_id": result.mapping_id,
+            "entities_found": result.total_entities,
+            "files_processed": result.files_processed,
+            "files_failed": result.files_failed,
+            "failed_files": [
+                {"name": n, "error": e} for n, e in result.failed_files
+            ],
+        }
+    if len(uploads) > 1:
+        results = list(_anonymize_each(uploads, output_dir, mapping_id))
+        return {"files_processed": len(results), "results": results}
+
+    # Single file
+    filename, data = uploads[0]
+    name = Path(filename)
+    out = output_dir / f"{name.stem}.anon{name.suffix}"
+    return anonymize_bytes(data, filename, output_path=out, mapping_id=mapping_id)
+
+
+def anonymize_streams(
+    streams: list[tuple[str, BinaryIO]],
+    output_dir: Path,
+    mapping_id: str | None = None,
+    merge: bool = False,
+) -> dict:
+    """Anonymize in-memory uploads the way POST /anonymize does.
+
+    The view is a thin wrapper around this, so callers that already hold
+    the file contents (tests, scripts) can skip the multipart round-trip.
+
+    Args:
+        streams: (filename, binary stream) pairs; unsupported types are skipped.
+        output_dir: Directory for the anonymized output file(s).
+        mapping_id: Mapping ID to use. Auto-generated from the first file if None.
+        merge: Merge several files into one output instead of one per file.
+
+    Returns:
+        The /anonymize JSON response body as a dict.
+
+    Raises:
+        ValueError: If none of the streams is a supported file type.
+    """
+    uploads = _read_uploads(streams)
+    if not uploads:
+        raise ValueError(_NO_SUPPORTED_FILES)
+    return _anonymize_uploads(uploads, output_dir, mapping_id, merge)
+
+
 @app.route("/")
 def index():
     """Serve the main UI page."""
     return render_template("index.html")
 
 
+@functools.lru_cache(maxsize=1)
+def _listing_store() -> MappingStore:
+    """Return the MappingStore used only to list mappings."""
+    return MappingStore()
+
+
+# A listing is reused for at most this many seconds, even with an unchanged
+# mtime: on filesystems with coarse timestamps (FAT, some network mounts) two
+# changes within one tick leave the mtime as it was
+_LISTING_TTL = 2.0
+
+# (mappings dir mtime_ns, time listed, mapping IDs) as of the last listing
+_mappings_listing: tuple[int, float, list[str]] | None = None
+
+
+def _list_mapping_ids() -> list[str]:
+    """List mapping IDs, reusing a recent listing while the directory is unchanged.
+
+    Creating, replacing or deleting a mapping file bumps the directory's
+    mtime, so one stat() stands in for a full directory scan.
+    """
+    global _mappings_listing
+    store = _listing_store()
+    mtime_ns = store.mappings_dir.stat().st_mtime_ns
+    now = time.monotonic()
+    if (
+        _mappings_listing is None
+        or _mappings_listing[0] != mtime_ns
+        or now - _mappings_listing[1] >= _LISTING_TTL
+    ):
+        _mappings_listing = (mtime_ns, now, store.list_mappings())
+    return _mappings_listing[2]
+
+
 @app.route("/mappings")
 def list_mappings():
-    """Return available mapping IDs as JSON."""
-    store = MappingStore()
-    return jsonify(store.list_mappings())
+    """Return available mapping IDs as JSON.
+
+    The response carries an ETag, so a client polling with If-None-Match
+    gets an empty 304 while the listing is unchanged.
+    """
+    resp = jsonify(_list_mapping_ids())
+    resp.add_etag()
+    return resp.make_conditional(request)
 
 
 @app.route("/anonymize", methods=["POST"])
@@ -55,71 +265,20 @@ def anonymize():
     mapping_id = request.form.get("mapping_id") or None
     merge = request.form.get("merge") == "true"
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        tmp = Path(tmpdir)
-        saved_files = []
-
-        for f in files:
-            if not f.filename:
-                continue
-            ext = Path(f.filename).suffix.lower()
-            if ext not in _SUPPORTED_EXTENSIONS:
-                continue
-            dest = tmp / f.filename
-            f.save(dest)
-            saved_files.append(dest)
-
-        if not saved_files:
-            return jsonify({
-                "error": "No supported files (.txt, .md) found in upload"
-            }), 400
-
-        if len(saved_files) > 1 and merge:
-            # Bulk mode — merge into single output
-            output_path = output_dir / "anonymized_merged.txt"
-            result = anonymize_folder(
-                folder_path=tmp,
-                output_path=output_path,
-                mapping_id=mapping_id,
-            )
-            return jsonify({
-                "output_path": result.output_path,
-                "mapping_id": result.mapping_id,
-                "entities_found": result.total_entities,
-                "files_processed": result.files_processed,
-                "files_failed": result.files_failed,
-                "failed_files": [
-                    {"name": n, "error": e} for n, e in result.failed_files
-                ],
-            })
-        elif len(saved_files) > 1:
-            # Multiple files, individual outputs
-            results = []
-            for sf in saved_files:
-                out = output_dir / f"{sf.stem}.anon{sf.suffix}"
-                r = anonymize_file(
-                    input_path=sf,
-                    output_path=out,
-                    mapping_id=mapping_id,
-                )
-                # Reuse the mapping_id from the first file for consistency
-                if mapping_id is None:
-                    mapping_id = r["mapping_id"]
-                results.append(r)
-            return jsonify({
-                "files_processed": len(results),
-                "results": results,
-            })
-        else:
-            # Single file
-            sf = saved_files[0]
-            out = output_dir / f"{sf.stem}.anon{sf.suffix}"
-            result = anonymize_file(
-                input_path=sf,
-                output_path=out,
-                mapping_id=mapping_id,
-            )
-            return jsonify(result)
+    uploads = _read_uploads((f.filename, f) for f in files)
+    if not uploads:
+        return jsonify({"error": _NO_SUPPORTED_FILES}), 400
+
+    # Multiple files, individual outputs: clients that accept NDJSON get
+    # each file's result as soon as it is written
+    streamed = len(uploads) > 1 and not merge
+    if streamed and request.accept_mimetypes.best == _NDJSON_MIMETYPE:
+        results = _anonymize_each(uploads, output_dir, mapping_id)
+        return Response(
+            stream_with_context(_stream_ndjson(results)),
+            mimetype=_NDJSON_MIMETYPE,
+        )
+    return jsonify(_anonymize_uploads(uploads, output_dir, mapping_id, merge))
 
 
 @app.route("/deanonymize", methods=["POST"])
@@ -1,7 +1,44 @@
 """Shared test fixtures for AnonTool tests."""
 
+import contextlib
+import io
+from types import SimpleNamespace
+
 import pytest
 
+from app import main as cli_main
+
+
+@pytest.fixture
+def run_cli_inproc():
+    """Run the CLI in this process, returning a CompletedProcess-like result.
+
+    Avoids a fresh interpreter (and spaCy load) per invocation; the result
+    has returncode, stdout and stderr like subprocess.run(..., text=True).
+    """
+
+    def run(*args: str) -> SimpleNamespace:
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                returncode = cli_main.main(list(args))
+            except SystemExit as exc:  # argparse --help / usage errors
+                code = exc.code
+                returncode = code if isinstance(code, int) else int(code is not None)
+        return SimpleNamespace(
+            returncode=returncode, stdout=stdout.getvalue(), stderr=stderr.getvalue()
+        )
+
+    return run
+
+
+@pytest.fixture(scope="session")
+def warm_detector():
+    """Load the spaCy pipeline once per session for tests that run detection."""
+    from app.services.detector import get_detector
+
+    return get_detector()
+
 
 @pytest.fixture
 def sample_text_simple():
@@ -1,6 +1,67 @@
 """Tests for the core anonymize/de-anonymize logic."""
 
-from app.services.anonymizer import AnonymizeResult, anonymize_text, deanonymize_text
+import threading
+
+import httpx
+import pytest
+
+from app.services.anonymizer import (
+    AnonymizeResult,
+    _get_store,
+    _pseudonymize,
+    anonymize_text,
+    anonymize_texts,
+    deanonymize_text,
+    get_mapping,
+)
+from app.services.detector import DetectedEntity
+from app.services.mapping_store import MappingStore
+
+
+class TestGetStore:
+    """Tests for the cached MappingStore lookup."""
+
+    def test_reuses_store(self, tmp_anontool_dir):
+        first = _get_store(tmp_anontool_dir, "cache-test")
+        assert _get_store(tmp_anontool_dir, "cache-test") is first
+
+    def test_reloads_after_external_change(self, tmp_anontool_dir):
+        cached = _get_store(tmp_anontool_dir, "cache-ext")
+        cached.save()
+
+        other = MappingStore(base_dir=tmp_anontool_dir)
+        other.create_or_load("cache-ext")
+        other.get_pseudonym("Alice Martinez", "PERSON")
+        other.save()
+
+        store = _get_store(tmp_anontool_dir, "cache-ext")
+        assert "Alice Martinez" in store.get_entries()
+
+    def test_get_mapping_returns_live_store(self, tmp_anontool_dir):
+        anonymize_text("write to bob@test.com", "live-map", base_dir=tmp_anontool_dir)
+        store = get_mapping("live-map", tmp_anontool_dir)
+        assert store is _get_store(tmp_anontool_dir, "live-map")
+        assert "bob@test.com" in store.get_entries()
+
+    def test_concurrent_calls_share_no_pseudonym(self, tmp_anontool_dir):
+        """Concurrent calls on one mapping give every name its own pseudonym."""
+        def worker(offset):
+            for i in range(offset, 200, 8):
+                name = f"user{i}@test.com"
+                entity = DetectedEntity(name, "EMAIL", 0, len(name), 0.95, "regex")
+                _pseudonymize(name, [entity], "threaded", tmp_anontool_dir)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        saved = MappingStore(base_dir=tmp_anontool_dir)
+        entries = saved.create_or_load("threaded")["entries"]
+        pseudonyms = {e["pseudonym"] for e in entries.values()}
+        assert len(entries) == 200
+        assert len(pseudonyms) == 200
 
 
 class TestAnonymizeText:
@@ -66,6 +127,49 @@ class TestAnonymizeText:
         assert mapping_file.exists()
 
 
+class TestAnonymizeTexts:
+    """Tests for the batched anonymize_texts function."""
+
+    def test_matches_sequential_calls(self, tmp_anontool_dir):
+        # Lowercase, regex-only PII: detection without the NER model
+        texts = ["mail a@example.com", "call 555-123-4567 or a@example.com"]
+        results = anonymize_texts(
+            texts, ["batch", "batch"], base_dir=tmp_anontool_dir
+        )
+
+        assert [r.anonymized_text for r in results] == [
+            "mail Email_1",
+            "call Phone_1 or Email_1",
+        ]
+        assert [r.mapping_id for r in results] == ["batch", "batch"]
+
+    def test_separate_mappings(self, tmp_anontool_dir):
+        results = anonymize_texts(
+            ["mail a@example.com", "mail b@example.com"],
+            ["one", "two"],
+            base_dir=tmp_anontool_dir,
+        )
+        assert [r.anonymized_text for r in results] == ["mail Email_1"] * 2
+
+    def test_length_mismatch_raises(self, tmp_anontool_dir):
+        with pytest.raises(ValueError):
+            anonymize_texts(["a", "b"], ["one"], base_dir=tmp_anontool_dir)
+
+    def test_ollama_http_error_falls_back(self, tmp_anontool_dir, monkeypatch):
+        """An HTTP failure while verifying keeps the unverified detections."""
+        from app.services.ollama_client import OllamaClient
+
+        def fail(self):
+            raise httpx.RemoteProtocolError("connection dropped")
+
+        monkeypatch.setattr(OllamaClient, "is_available", fail)
+        results = anonymize_texts(
+            ["mail a@example.com"], ["ollama-down"],
+            base_dir=tmp_anontool_dir, use_ollama=True,
+        )
+        assert results[0].anonymized_text == "mail Email_1"
+
+
 class TestDeanonymizeText:
     """Tests for the deanonymize_text function."""
 
@@ -80,9 +184,22 @@ class TestDeanonymizeText:
 
     def test_empty_mapping_returns_text(self, tmp_anontool_dir):
         text = "Person_A went to the store."
-        restored = deanonymize_text(text, "nonexistent-id", base_dir=tmp_anontool_dir)
+        restored = deanonymize_text(
+            text, "nonexistent-id", base_dir=tmp_anontool_dir
+        )
         assert restored == text
 
+    def test_longer_pseudonym_not_split(self, tmp_anontool_dir):
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        store.create_or_load("test-aa")
+        for i in range(27):
+            store.get_pseudonym(f"Name {i}", "PERSON")
+        store.save()
+        restored = deanonymize_text(
+            "Person_A and Person_AA", "test-aa", base_dir=tmp_anontool_dir
+        )
+        assert restored == "Name 0 and Name 26"
+
     def test_deanonymize_no_entities_text(self, tmp_anontool_dir):
         text = "The weather is sunny."
         anonymize_text(text, "test-noent", base_dir=tmp_anontool_dir)
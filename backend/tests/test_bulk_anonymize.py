@@ -2,20 +2,25 @@
 
 from __future__ import annotations
 
-import subprocess
-import sys
 import time
 from pathlib import Path
 from unittest.mock import MagicMock
 
 import pytest
 
+from app.services import anonymizer
 from app.services.anonymizer import (
     BulkAnonymizeResult,
+    _detect_workers,
     _get_file_creation_time,
+    _get_file_creation_time_ns,
+    _iter_supported,
     anonymize_folder,
 )
 
+# Enough text to clear the byte threshold for a worker pool
+_BIG = 64 << 20
+
 
 class TestGetFileCreationTime:
     """Tests for _get_file_creation_time helper."""
@@ -37,6 +42,13 @@ class TestGetFileCreationTime:
         f2.write_text("second")
         assert _get_file_creation_time(f1) <= _get_file_creation_time(f2)
 
+    def test_ns_variant_is_integer_and_consistent(self, tmp_path):
+        f = tmp_path / "test.txt"
+        f.write_text("hello")
+        ns = _get_file_creation_time_ns(f)
+        assert isinstance(ns, int)
+        assert _get_file_creation_time(f) == ns / 1e9
+
 
 class TestAnonymizeFolder:
     """Tests for anonymize_folder function."""
@@ -173,6 +185,15 @@ class TestAnonymizeFolder:
         assert "data.csv" not in output
         assert "image.png" not in output
 
+    def test_skips_directories_and_bare_dotfiles(self, tmp_path):
+        """Only regular files with a supported suffix are collected."""
+        (tmp_path / "notes.txt").mkdir()
+        (tmp_path / ".md").write_text("dotfile, no suffix")
+        (tmp_path / "keep.md").write_text("kept")
+        (tmp_path / "archive.txt.gz").write_bytes(b"")
+
+        assert [e.name for e in _iter_supported(tmp_path)] == ["keep.md"]
+
     def test_folder_not_found(self, tmp_path, tmp_anontool_dir):
         """Non-existent folder should raise FileNotFoundError."""
         with pytest.raises(FileNotFoundError, match="Folder not found"):
@@ -268,6 +289,45 @@ class TestAnonymizeFolder:
         assert first_call[0][0] == 1  # current
         assert first_call[0][1] == 3  # total
 
+    def test_progress_reported_after_each_file(
+        self, tmp_path, tmp_anontool_dir, monkeypatch
+    ):
+        """Each file is reported once its pseudonyms are written, in order."""
+        folder = tmp_path / "docs"
+        folder.mkdir()
+        for name in ("first", "second", "third"):
+            # Lowercase, regex-only PII: detection without the NER model
+            (folder / f"{name}.txt").write_text(f"{name}: ask {name}@example.com")
+            time.sleep(0.01)
+        (folder / "fourth.txt").write_bytes(b"\xff\xfe")
+
+        events = []
+        real_pseudonymize = anonymizer._pseudonymize
+
+        def tracking_pseudonymize(text, *args, **kwargs):
+            events.append(("pseudonymized", text.split(":")[0]))
+            return real_pseudonymize(text, *args, **kwargs)
+
+        monkeypatch.setattr(anonymizer, "_pseudonymize", tracking_pseudonymize)
+        anonymize_folder(
+            folder,
+            output_path=tmp_path / "out.txt",
+            mapping_id="progress_order",
+            base_dir=tmp_anontool_dir,
+            progress_callback=lambda i, n, name: events.append((i, n, name)),
+            use_cache=False,
+        )
+
+        assert events == [
+            ("pseudonymized", "first"),
+            (1, 4, "first.txt"),
+            ("pseudonymized", "second"),
+            (2, 4, "second.txt"),
+            ("pseudonymized", "third"),
+            (3, 4, "third.txt"),
+            (4, 4, "fourth.txt"),
+        ]
+
     def test_entity_count_totals(self, sample_transcript_folder, tmp_anontool_dir):
         """Total entities should sum correctly across all files."""
         result = anonymize_folder(
@@ -296,25 +356,169 @@ class TestAnonymizeFolder:
         assert "=== only.txt" in output
         assert "Alice Martinez" not in output
 
+    def test_merged_output_sections(self, tmp_path, tmp_anontool_dir):
+        """Sections are separated by one blank line, with no trailing separator."""
+        folder = tmp_path / "docs"
+        folder.mkdir()
+        (folder / "a.txt").write_text("mail one@example.com")
+        time.sleep(0.01)
+        (folder / "b.txt").write_text("café, no pii here")
+
+        result = anonymize_folder(
+            folder,
+            output_path=tmp_path / "merged.txt",
+            mapping_id="sections",
+            base_dir=tmp_anontool_dir,
+            fsync_output=True,
+        )
+
+        sections = (tmp_path / "merged.txt").read_text(encoding="utf-8").split("\n\n")
+        assert result.files_processed == 2
+        assert sections[0].startswith("=== a.txt (Created: ")
+        assert "one@example.com" not in sections[1]
+        assert sections[2].startswith("=== b.txt (Created: ")
+        assert sections[3] == "café, no pii here"
+
+
+class TestParallelDetection:
+    """Tests for multi-process entity detection in folder mode."""
+
+    def test_small_folders_stay_serial(self, monkeypatch):
+        monkeypatch.setenv("ANONTOOL_DETECT_WORKERS", "8")
+        assert _detect_workers(3, _BIG) == 1
+
+    def test_little_text_stays_serial(self, monkeypatch):
+        monkeypatch.setenv("ANONTOOL_DETECT_WORKERS", "8")
+        assert _detect_workers(100, 64 << 10) == 1
+
+    def test_workers_from_env(self, monkeypatch):
+        monkeypatch.setenv("ANONTOOL_DETECT_WORKERS", "2")
+        assert _detect_workers(10, _BIG) == 2
+
+    def test_workers_capped_by_file_count(self, monkeypatch):
+        monkeypatch.setenv("ANONTOOL_DETECT_WORKERS", "16")
+        assert _detect_workers(5, _BIG) == 5
+
+    def test_default_capped(self, monkeypatch):
+        monkeypatch.delenv("ANONTOOL_DETECT_WORKERS", raising=False)
+        monkeypatch.setattr(anonymizer.os, "cpu_count", lambda: 64)
+        assert _detect_workers(1000, _BIG) == anonymizer._MAX_DETECT_WORKERS
+
+    def test_invalid_env_falls_back_to_default(self, monkeypatch):
+        monkeypatch.setenv("ANONTOOL_DETECT_WORKERS", "lots")
+        assert 1 <= _detect_workers(1000, _BIG) <= anonymizer._MAX_DETECT_WORKERS
+
+    def test_parallel_matches_serial(self, tmp_path, tmp_anontool_dir, monkeypatch):
+        """The pool yields the same merged output and shared pseudonyms."""
+        folder = tmp_path / "docs"
+        folder.mkdir()
+        for i in range(5):
+            # Lowercase, regex-only PII: detection without the NER model
+            (folder / f"doc_{i}.txt").write_text(
+                f"mail shared@example.com or call 555-000-000{i}"
+            )
+            time.sleep(0.01)
+        (folder / "bad.txt").write_bytes(b"\xff\xfe")
+
+        monkeypatch.setenv("ANONTOOL_DETECT_WORKERS", "1")
+        serial = anonymize_folder(
+            folder, output_path=tmp_path / "serial.txt",
+            mapping_id="serial", base_dir=tmp_anontool_dir, use_cache=False,
+        )
+        monkeypatch.setenv("ANONTOOL_DETECT_WORKERS", "2")
+        monkeypatch.setattr(anonymizer, "_PARALLEL_MIN_FILES", 2)
+        monkeypatch.setattr(anonymizer, "_PARALLEL_MIN_BYTES", 0)
+        parallel = anonymize_folder(
+            folder, output_path=tmp_path / "parallel.txt",
+            mapping_id="parallel", base_dir=tmp_anontool_dir, use_cache=False,
+        )
+
+        assert parallel.files_processed == serial.files_processed == 5
+        assert parallel.failed_files == serial.failed_files
+        assert [n for n, _ in parallel.failed_files] == ["bad.txt"]
+        assert (tmp_path / "parallel.txt").read_text() == (
+            tmp_path / "serial.txt"
+        ).read_text()
+
+
+    def test_parallel_false_keeps_spacy_in_process(
+        self, tmp_path, tmp_anontool_dir, monkeypatch
+    ):
+        """parallel=False reaches spaCy as n_process=1."""
+        folder = tmp_path / "docs"
+        folder.mkdir()
+        (folder / "doc.txt").write_text("mail a@example.com")
+        seen = []
+
+        def record(texts, n_process=None):
+            seen.append(n_process)
+            return [[] for _ in texts]
+
+        monkeypatch.setattr(anonymizer, "detect_entities_batch", record)
+        anonymize_folder(
+            folder, output_path=tmp_path / "out.txt", mapping_id="serial",
+            base_dir=tmp_anontool_dir, use_cache=False, parallel=False,
+        )
+        assert seen == [1]
+
+
+class TestDetectionCache:
+    """Tests for reusing cached detection results across folder runs."""
+
+    @pytest.fixture
+    def folder(self, tmp_path):
+        folder = tmp_path / "docs"
+        folder.mkdir()
+        for i in range(3):
+            (folder / f"doc_{i}.txt").write_text(f"mail user{i}@example.com")
+            time.sleep(0.01)
+        return folder
+
+    def _run(self, folder, base_dir, **kwargs):
+        return anonymize_folder(folder, mapping_id="cached", base_dir=base_dir, **kwargs)
+
+    def test_rerun_hits_cache(self, folder, tmp_anontool_dir, monkeypatch):
+        first = self._run(folder, tmp_anontool_dir)
+        assert first.cache_hits == 0
+
+        def fail(texts, **kwargs):
+            raise AssertionError("detection should come from the cache")
+
+        monkeypatch.setattr(anonymizer, "detect_entities_batch", fail)
+        second = self._run(folder, tmp_anontool_dir)
+        assert second.cache_hits == 3
+        assert second.total_entities == first.total_entities
+        assert Path(second.output_path).read_text() == Path(first.output_path).read_text()
+
+    def test_modified_file_is_redetected(self, folder, tmp_anontool_dir):
+        self._run(folder, tmp_anontool_dir)
+        (folder / "doc_1.txt").write_text("call 555-123-4567 or mail a@b.com")
+
+        result = self._run(folder, tmp_anontool_dir)
+        assert result.cache_hits == 2
+        assert result.total_entities == 4
+
+    def test_use_cache_false_skips_cache(self, folder, tmp_anontool_dir):
+        self._run(folder, tmp_anontool_dir, use_cache=False)
+        result = self._run(folder, tmp_anontool_dir, use_cache=False)
+        assert result.cache_hits == 0
+        assert not (tmp_anontool_dir / "detect_cache.sqlite3").exists()
+
 
 class TestBulkAnonymizeCLI:
     """Tests for the bulk-anonymize CLI subcommand."""
 
-    def test_bulk_anonymize_help(self):
+    def test_bulk_anonymize_help(self, run_cli_inproc):
         """--help should show folder argument and options."""
-        result = subprocess.run(
-            [sys.executable, "-m", "app.main", "bulk-anonymize", "--help"],
-            capture_output=True,
-            text=True,
-            cwd=str(Path(__file__).parent.parent),
-        )
+        result = run_cli_inproc("bulk-anonymize", "--help")
         assert result.returncode == 0
         assert "folder" in result.stdout
         assert "--mapping-id" in result.stdout
         assert "--output" in result.stdout
         assert "--use-ollama" in result.stdout
 
-    def test_bulk_anonymize_end_to_end(self, tmp_path):
+    @pytest.mark.usefixtures("warm_detector")
+    def test_bulk_anonymize_end_to_end(self, run_cli_inproc, tmp_path):
         """Full CLI flow: create folder, run command, verify output."""
         folder = tmp_path / "cli_test"
         folder.mkdir()
@@ -327,21 +531,13 @@ class TestBulkAnonymizeCLI:
 
         output_file = tmp_path / "merged.txt"
 
-        result = subprocess.run(
-            [
-                sys.executable,
-                "-m",
-                "app.main",
-                "bulk-anonymize",
-                str(folder),
-                "--mapping-id",
-                "cli_e2e",
-                "--output",
-                str(output_file),
-            ],
-            capture_output=True,
-            text=True,
-            cwd=str(Path(__file__).parent.parent),
+        result = run_cli_inproc(
+            "bulk-anonymize",
+            str(folder),
+            "--mapping-id",
+            "cli_e2e",
+            "--output",
+            str(output_file),
         )
 
         assert result.returncode == 0
@@ -353,41 +549,19 @@ class TestBulkAnonymizeCLI:
         assert "=== doc1.txt" in content
         assert "=== doc2.txt" in content
 
-    def test_bulk_anonymize_folder_not_found(self):
+    def test_bulk_anonymize_folder_not_found(self, run_cli_inproc):
         """Should print error and exit 1 for missing folder."""
-        result = subprocess.run(
-            [
-                sys.executable,
-                "-m",
-                "app.main",
-                "bulk-anonymize",
-                "/nonexistent/folder",
-            ],
-            capture_output=True,
-            text=True,
-            cwd=str(Path(__file__).parent.parent),
-        )
+        result = run_cli_inproc("bulk-anonymize", "/nonexistent/folder")
 
         assert result.returncode == 1
         assert "Folder not found" in result.stderr
 
-    def test_bulk_anonymize_empty_folder(self, tmp_path):
+    def test_bulk_anonymize_empty_folder(self, run_cli_inproc, tmp_path):
         """Should print error for empty folder."""
         folder = tmp_path / "empty_cli"
         folder.mkdir()
 
-        result = subprocess.run(
-            [
-                sys.executable,
-                "-m",
-                "app.main",
-                "bulk-anonymize",
-                str(folder),
-            ],
-            capture_output=True,
-            text=True,
-            cwd=str(Path(__file__).parent.parent),
-        )
+        result = run_cli_inproc("bulk-anonymize", str(folder))
 
         assert result.returncode == 1
         assert "No supported files" in result.stderr
@@ -1,11 +1,21 @@
-"""CLI integration tests using subprocess."""
+"""CLI integration tests.
+
+Most tests call the entry point in-process (see ``run_cli_inproc`` in
+conftest); ``test_main_help`` still spawns ``python -m app.main`` to cover
+the real entry point.
+"""
 
 from __future__ import annotations
 
+import io
 import subprocess
 import sys
 from pathlib import Path
 
+import pytest
+
+from app.main import _CYAN, _color, _sniff_subcommand, build_parser
+
 
 def run_cli(*args: str, cwd: str | None = None) -> subprocess.CompletedProcess:
     """Run the CLI as a subprocess."""
@@ -29,33 +39,56 @@ class TestCLIHelp:
         assert "list-mappings" in result.stdout
         assert "show-mapping" in result.stdout
 
-    def test_anonymize_help(self):
-        result = run_cli("anonymize", "--help")
+    def test_anonymize_help(self, run_cli_inproc):
+        result = run_cli_inproc("anonymize", "--help")
         assert result.returncode == 0
         assert "input_file" in result.stdout
         assert "--mapping-id" in result.stdout
         assert "--use-ollama" in result.stdout
 
-    def test_deanonymize_help(self):
-        result = run_cli("deanonymize", "--help")
+    def test_deanonymize_help(self, run_cli_inproc):
+        result = run_cli_inproc("deanonymize", "--help")
         assert result.returncode == 0
         assert "input_file" in result.stdout
         assert "--mapping-id" in result.stdout
 
-    def test_no_command_shows_help(self):
-        result = run_cli()
+    def test_no_command_shows_help(self, run_cli_inproc):
+        result = run_cli_inproc()
         assert result.returncode == 1
 
 
+class TestSubcommandSniffing:
+    """Tests for building only the invoked subcommand's parser."""
+
+    def test_sniffs_known_command(self):
+        assert _sniff_subcommand(["list-mappings"]) == "list-mappings"
+
+    def test_skips_leading_flags(self):
+        assert _sniff_subcommand(["-h", "anonymize"]) == "anonymize"
+
+    def test_unknown_command_returns_none(self):
+        assert _sniff_subcommand(["bogus", "anonymize"]) is None
+
+    def test_no_args_returns_none(self):
+        assert _sniff_subcommand([]) is None
+
+    def test_build_parser_single_command(self):
+        parser = build_parser("show-mapping")
+        args = parser.parse_args(["show-mapping", "abc"])
+        assert args.command == "show-mapping"
+        assert args.mapping_id == "abc"
+
+
 class TestCLIAnonymize:
     """Tests for the anonymize subcommand."""
 
-    def test_anonymize_file(self, tmp_path):
+    @pytest.mark.usefixtures("warm_detector")
+    def test_anonymize_file(self, run_cli_inproc, tmp_path):
         input_file = tmp_path / "test.txt"
         input_file.write_text("John Smith works at Acme Corporation.")
         output_file = tmp_path / "out.txt"
 
-        result = run_cli(
+        result = run_cli_inproc(
             "anonymize",
             str(input_file),
             "--mapping-id", "cli-test",
@@ -68,16 +101,16 @@ class TestCLIAnonymize:
         content = output_file.read_text()
         assert "John Smith" not in content
 
-    def test_anonymize_file_not_found(self):
-        result = run_cli("anonymize", "/tmp/nonexistent_file_xyz.txt")
+    def test_anonymize_file_not_found(self, run_cli_inproc):
+        result = run_cli_inproc("anonymize", "/tmp/nonexistent_file_xyz.txt")
         assert result.returncode == 1
         assert "not found" in result.stderr.lower() or "not found" in result.stdout.lower()
 
-    def test_anonymize_unsupported_format(self, tmp_path):
+    def test_anonymize_unsupported_format(self, run_cli_inproc, tmp_path):
         input_file = tmp_path / "data.csv"
         input_file.write_text("name\nJohn")
 
-        result = run_cli(
+        result = run_cli_inproc(
             "anonymize",
             str(input_file),
             "--mapping-id", "csv-test",
@@ -89,14 +122,15 @@ class TestCLIAnonymize:
 class TestCLIDeanonymize:
     """Tests for the deanonymize subcommand."""
 
-    def test_deanonymize_round_trip(self, tmp_path):
+    @pytest.mark.usefixtures("warm_detector")
+    def test_deanonymize_round_trip(self, run_cli_inproc, tmp_path):
         # First anonymize
         input_file = tmp_path / "original.txt"
         original = "John Smith met with Jane Doe at the office."
         input_file.write_text(original)
         anon_file = tmp_path / "anon.txt"
 
-        run_cli(
+        run_cli_inproc(
             "anonymize",
             str(input_file),
             "--mapping-id", "cli-rt",
@@ -105,7 +139,7 @@ class TestCLIDeanonymize:
 
         # Then deanonymize
         restored_file = tmp_path / "restored.txt"
-        result = run_cli(
+        result = run_cli_inproc(
             "deanonymize",
             str(anon_file),
             "--mapping-id", "cli-rt",
@@ -116,11 +150,11 @@ class TestCLIDeanonymize:
         assert "De-anonymization complete" in result.stdout
         assert restored_file.read_text() == original
 
-    def test_deanonymize_missing_mapping(self, tmp_path):
+    def test_deanonymize_missing_mapping(self, run_cli_inproc, tmp_path):
         input_file = tmp_path / "anon.txt"
         input_file.write_text("Person_A went to the store.")
 
-        result = run_cli(
+        result = run_cli_inproc(
             "deanonymize",
             str(input_file),
             "--mapping-id", "nonexistent-mapping-xyz",
@@ -133,6 +167,52 @@ class TestCLIDeanonymize:
 class TestCLIListMappings:
     """Tests for the list-mappings subcommand."""
 
-    def test_list_mappings(self):
-        result = run_cli("list-mappings")
+    def test_list_mappings(self, run_cli_inproc):
+        result = run_cli_inproc("list-mappings")
         assert result.returncode == 0
+
+    def test_piped_output_has_no_ansi_codes(self, run_cli_inproc, monkeypatch):
+        monkeypatch.delenv("NO_COLOR", raising=False)
+        result = run_cli_inproc("list-mappings")
+        assert "\033[" not in result.stdout
+
+
+class _FakeStream(io.StringIO):
+    """A text stream that reports a fixed isatty() answer."""
+
+    def __init__(self, tty: bool):
+        super().__init__()
+        self._tty = tty
+
+    def isatty(self) -> bool:
+        return self._tty
+
+
+class TestColor:
+    """Tests for ANSI color handling."""
+
+    def test_color_enabled_for_tty(self, monkeypatch):
+        monkeypatch.delenv("NO_COLOR", raising=False)
+        assert _color("hi", _CYAN, _FakeStream(tty=True)) == "\033[36mhi\033[0m"
+
+    def test_color_disabled_when_piped(self, monkeypatch):
+        monkeypatch.delenv("NO_COLOR", raising=False)
+        assert _color("hi", _CYAN, _FakeStream(tty=False)) == "hi"
+
+    def test_no_color_env(self, monkeypatch):
+        monkeypatch.setenv("NO_COLOR", "1")
+        assert _color("hi", _CYAN, _FakeStream(tty=True)) == "hi"
+
+    def test_checks_stdout_at_call_time(self, monkeypatch):
+        """A redirect after import is honored."""
+        monkeypatch.delenv("NO_COLOR", raising=False)
+        monkeypatch.setattr(sys, "stdout", _FakeStream(tty=True))
+        assert _color("hi", _CYAN) == "\033[36mhi\033[0m"
+        monkeypatch.setattr(sys, "stdout", _FakeStream(tty=False))
+        assert _color("hi", _CYAN) == "hi"
+
+    def test_stderr_uses_its_own_tty_state(self, monkeypatch):
+        """Errors are plain when stderr is piped, even if stdout is a terminal."""
+        monkeypatch.delenv("NO_COLOR", raising=False)
+        monkeypatch.setattr(sys, "stdout", _FakeStream(tty=True))
+        assert _color("oops", _CYAN, _FakeStream(tty=False)) == "oops"
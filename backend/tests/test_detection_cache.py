@@ -0,0 +1,72 @@
+"""Tests for the on-disk detection result cache."""
+
+from pathlib import Path
+
+import pytest
+
+from app.services.detection_cache import DetectionCache
+from app.services.detector import DetectedEntity
+
+ENTITIES = [
+    DetectedEntity("Zoë Müller", "PERSON", 0, 10, 0.85, "spacy"),
+    DetectedEntity("zoe@example.com", "EMAIL", 15, 30, 0.95, "regex"),
+]
+TEXT = "Zoë Müller at zoe@example.com"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DetectionCache(base_dir=tmp_path)
+    yield cache
+    cache.close()
+
+
+class TestDetectionCache:
+    """Tests for DetectionCache lookups and invalidation."""
+
+    def test_round_trip(self, cache):
+        cache.put_many([(Path("/a.txt"), 31, 100, TEXT, ENTITIES)], "v1")
+        assert cache.get(Path("/a.txt"), 31, 100, TEXT, "v1") == ENTITIES
+
+    def test_miss_for_unknown_path(self, cache):
+        assert cache.get(Path("/missing.txt"), 1, 1, "x", "v1") is None
+
+    @pytest.mark.parametrize(
+        "size, mtime_ns, text, model_ver",
+        [
+            (32, 100, TEXT, "v1"),
+            (31, 101, TEXT, "v1"),
+            (31, 100, TEXT + "!", "v1"),
+            (31, 100, TEXT, "v2"),
+        ],
+        ids=["size", "mtime", "content", "model"],
+    )
+    def test_miss_when_key_changes(self, cache, size, mtime_ns, text, model_ver):
+        cache.put_many([(Path("/a.txt"), 31, 100, TEXT, ENTITIES)], "v1")
+        assert cache.get(Path("/a.txt"), size, mtime_ns, text, model_ver) is None
+
+    def test_put_replaces_previous_entry(self, cache):
+        cache.put_many([(Path("/a.txt"), 31, 100, TEXT, ENTITIES)], "v1")
+        cache.put_many([(Path("/a.txt"), 31, 200, TEXT, [])], "v1")
+        assert cache.get(Path("/a.txt"), 31, 200, TEXT, "v1") == []
+        assert cache.get(Path("/a.txt"), 31, 100, TEXT, "v1") is None
+
+    def test_persists_across_instances(self, tmp_path):
+        first = DetectionCache(base_dir=tmp_path)
+        first.put_many([(Path("/a.txt"), 31, 100, TEXT, ENTITIES)], "v1")
+        first.close()
+
+        second = DetectionCache(base_dir=tmp_path)
+        try:
+            assert second.get(Path("/a.txt"), 31, 100, TEXT, "v1") == ENTITIES
+        finally:
+            second.close()
+
+    def test_unreadable_cache_is_a_miss(self, tmp_path):
+        (tmp_path / "detect_cache.sqlite3").write_bytes(b"not a database" * 100)
+        cache = DetectionCache(base_dir=tmp_path)
+        try:
+            assert cache.get(Path("/a.txt"), 1, 1, "x", "v1") is None
+            cache.put_many([(Path("/a.txt"), 1, 1, "x", [])], "v1")
+        finally:
+            cache.close()
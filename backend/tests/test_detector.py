@@ -1,13 +1,28 @@
 """Tests for the name/PII detection pipeline."""
 
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import spacy
+
+from app.services import detector
 from app.services.detector import (
     DetectedEntity,
     _deduplicate,
     _detect_ner,
+    _detect_ner_batch,
     _detect_regex,
     _estimate_confidence,
+    _has_uppercase,
     _is_inside_email,
+    _may_contain_regex_pii,
+    _pick_n_process,
+    _spacy_batch_size,
+    _split_into_chunks,
     detect_entities,
+    detect_entities_batch,
+    get_detector,
 )
 
 
@@ -53,6 +68,33 @@ class TestRegexDetection:
         phones = [e for e in entities if e.entity_type == "PHONE"]
         assert len(phones) == 1
 
+    def test_phone_excludes_leading_separator(self):
+        text = "Call (555) 123-4567 or 555-987-6543."
+        phones = [e.text for e in _detect_regex(text) if e.entity_type == "PHONE"]
+        assert phones == ["(555) 123-4567", "555-987-6543"]
+
+    def test_detect_phone_country_code(self):
+        text = "Dial +1 555 123 4567 or 1-555-987-6543."
+        phones = [e.text for e in _detect_regex(text) if e.entity_type == "PHONE"]
+        assert phones == ["+1 555 123 4567", "1-555-987-6543"]
+
+    def test_detect_phone_unbalanced_paren(self):
+        text = "Number: 555) 123-4567"
+        phones = [e.text for e in _detect_regex(text) if e.entity_type == "PHONE"]
+        assert phones == ["555) 123-4567"]
+
+    def test_phone_separator_is_one_character(self):
+        text = "Room 555\n\n123-4567 and 555  987-6543"
+        assert [e for e in _detect_regex(text) if e.entity_type == "PHONE"] == []
+
+    def test_detect_phone_bare_plus(self):
+        text = "Dial +555 123 4567 now"
+        phones = [e.text for e in _detect_regex(text) if e.entity_type == "PHONE"]
+        assert phones == ["+555 123 4567"]
+
+    def test_long_digit_run_not_phone(self):
+        assert _detect_regex("Order 12345678901234 shipped.") == []
+
     def test_detect_multiple_emails(self):
         text = "Send to alice@a.com or bob@b.com."
         entities = _detect_regex(text)
@@ -71,6 +113,61 @@ class TestRegexDetection:
         assert "EMAIL" in types
         assert "PHONE" in types
 
+    def test_combined_scan_matches_separate_patterns(self):
+        text = (
+            "Mail a.b@ex.com, call (555) 123-4567, cc c@d.org or "
+            "dial +1 555 987 6543 (x@y.io)."
+        )
+        separate = sorted(
+            [(m.start(), m.end(), "EMAIL") for m in detector.EMAIL_PATTERN.finditer(text)]
+            + [(m.start(), m.end(), "PHONE") for m in detector.PHONE_PATTERN.finditer(text)]
+        )
+        combined = [(e.start, e.end, e.entity_type) for e in _detect_regex(text)]
+        assert combined == separate
+
+
+class TestRegexPrefilter:
+    """Tests for the optional Hyperscan prefilter gate."""
+
+    def test_without_hyperscan_always_scans(self, monkeypatch):
+        monkeypatch.setattr(detector, "hyperscan", None)
+        assert _may_contain_regex_pii("no pii here") is True
+
+    def test_detects_candidates(self):
+        assert _may_contain_regex_pii("Mail me at a@b.com") is True
+        assert _may_contain_regex_pii("Call 555-123-4567") is True
+
+    def test_rejects_plain_text(self):
+        if detector.hyperscan is None:
+            pytest.skip("hyperscan not installed")
+        assert _may_contain_regex_pii("The weather is sunny today.") is False
+
+    def test_concurrent_scans(self):
+        if detector.hyperscan is None:
+            pytest.skip("hyperscan not installed")
+        texts = ["Mail me at a@b.com", "The weather is sunny today."] * 200
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(_may_contain_regex_pii, texts))
+        assert results == [True, False] * 200
+
+    def test_hyperscan_error_falls_back_to_regex(self, monkeypatch):
+        if detector.hyperscan is None:
+            pytest.skip("hyperscan not installed")
+
+        class BrokenDatabase:
+            def scan(self, *args, **kwargs):
+                raise detector.hyperscan.error("scratch in use")
+
+        monkeypatch.setattr(detector, "_get_hs_database", BrokenDatabase)
+        monkeypatch.setattr(detector, "_get_hs_scratch", lambda db: None)
+        assert _may_contain_regex_pii("The weather is sunny today.") is True
+
+    def test_detect_regex_unchanged_without_hyperscan(self, monkeypatch):
+        text = "Contact sarah@example.com or (555) 987-6543."
+        with_prefilter = _detect_regex(text)
+        monkeypatch.setattr(detector, "hyperscan", None)
+        assert _detect_regex(text) == with_prefilter
+
 
 # ---------------------------------------------------------------------------
 # spaCy NER detection tests
@@ -103,6 +200,14 @@ class TestNerDetection:
         entities = _detect_ner(text)
         assert len(entities) == 0
 
+    def test_batch_matches_single_calls(self):
+        texts = [
+            "John Smith attended the meeting.",
+            "",
+            "She works at Google and previously was at Microsoft.",
+        ]
+        assert _detect_ner_batch(texts) == [_detect_ner(t) for t in texts]
+
 
 # ---------------------------------------------------------------------------
 # Confidence estimation tests
@@ -124,6 +229,156 @@ class TestConfidenceEstimation:
     def test_three_word_name(self):
         assert _estimate_confidence("Mary Jane Watson") == 0.90
 
+    def test_other_whitespace_separates_words(self):
+        assert _estimate_confidence("John\nSmith") == 0.90
+
+    def test_surrounding_whitespace_ignored(self):
+        assert _estimate_confidence("Smith ") == 0.80
+        assert _estimate_confidence("   ") == 0.60
+
+
+# ---------------------------------------------------------------------------
+# Chunking tests
+# ---------------------------------------------------------------------------
+
+
+class TestSplitIntoChunks:
+    """Tests for splitting large texts into spaCy-sized ranges."""
+
+    def test_small_text_single_range(self):
+        assert _split_into_chunks("short text") == [(0, 10)]
+
+    def test_splits_after_newline(self, monkeypatch):
+        monkeypatch.setattr(detector, "_MAX_CHUNK_SIZE", 10)
+        text = "abc\ndefghijkl\nmnop"
+        assert _split_into_chunks(text) == [(0, 4), (4, 14), (14, 18)]
+
+    def test_splits_at_limit_without_newline(self, monkeypatch):
+        monkeypatch.setattr(detector, "_MAX_CHUNK_SIZE", 10)
+        assert _split_into_chunks("x" * 25) == [(0, 10), (10, 20), (20, 25)]
+
+    def test_non_ascii_offsets_are_characters(self, monkeypatch):
+        monkeypatch.setattr(detector, "_MAX_CHUNK_SIZE", 10)
+        text = "Zoë Müll\nJosé Núñez\nend"
+        ranges = _split_into_chunks(text)
+        assert ranges == [(0, 9), (9, 19), (19, 23)]
+        assert text[ranges[1][0] : ranges[1][1]] == "José Núñez"
+
+    def test_ranges_cover_text(self, monkeypatch):
+        monkeypatch.setattr(detector, "_MAX_CHUNK_SIZE", 16)
+        text = "line one\nline two is longer\n\nshort\n" * 5
+        ranges = _split_into_chunks(text)
+        assert "".join(text[s:e] for s, e in ranges) == text
+        assert all(e - s <= 16 for s, e in ranges)
+
+
+# ---------------------------------------------------------------------------
+# Model loading tests
+# ---------------------------------------------------------------------------
+
+
+class TestGetDetector:
+    """Tests for the shared, lazily loaded spaCy pipeline."""
+
+    def test_loads_once_across_threads(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(detector, "_nlp", None)
+        monkeypatch.setattr(
+            spacy, "load", lambda name, exclude: calls.append(name) or object()
+        )
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_detector()))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert calls == ["en_core_web_sm"]
+        assert len({id(r) for r in results}) == 1
+
+
+# ---------------------------------------------------------------------------
+# spaCy batch size config tests
+# ---------------------------------------------------------------------------
+
+
+class TestSpacyBatchSize:
+    """Tests for the ANONTOOL_SPACY_BATCH_SIZE setting."""
+
+    def test_default(self, monkeypatch):
+        monkeypatch.delenv("ANONTOOL_SPACY_BATCH_SIZE", raising=False)
+        assert _spacy_batch_size() == 8
+
+    def test_env_override(self, monkeypatch):
+        monkeypatch.setenv("ANONTOOL_SPACY_BATCH_SIZE", "32")
+        assert _spacy_batch_size() == 32
+
+    def test_invalid_env_falls_back(self, monkeypatch):
+        monkeypatch.setenv("ANONTOOL_SPACY_BATCH_SIZE", "lots")
+        assert _spacy_batch_size() == 8
+
+
+class TestPickNProcess:
+    """Tests for choosing the nlp.pipe() worker count."""
+
+    def test_small_text_single_process(self):
+        assert _pick_n_process(5_000, 1) == 1
+
+    def test_single_chunk_single_process(self):
+        assert _pick_n_process(950_000, 1) == 1
+
+    def test_large_text_capped_by_chunks(self, monkeypatch):
+        monkeypatch.setattr("os.cpu_count", lambda: 16)
+        assert _pick_n_process(3_000_000, 4) == 4
+
+    def test_large_text_capped_by_cores(self, monkeypatch):
+        monkeypatch.setattr("os.cpu_count", lambda: 2)
+        assert _pick_n_process(3_000_000, 4) == 1
+
+    def test_large_text_capped_by_env(self, monkeypatch):
+        monkeypatch.setattr("os.cpu_count", lambda: 16)
+        monkeypatch.setenv("ANONTOOL_DETECT_WORKERS", "1")
+        assert _pick_n_process(3_000_000, 4) == 1
+
+
+class TestNerBatchProcesses:
+    """Tests for the nlp.pipe() settings _detect_ner_batch chooses."""
+
+    @pytest.fixture
+    def pipe_calls(self, monkeypatch):
+        """Replace the spaCy model with one that records its pipe() kwargs."""
+        calls = []
+
+        class FakeNlp:
+            def pipe(self, texts, batch_size, n_process):
+                calls.append((batch_size, n_process))
+                return (spacy.blank("en")(t) for t in texts)
+
+        monkeypatch.setattr(detector, "get_detector", FakeNlp)
+        monkeypatch.setattr(detector, "_MAX_CHUNK_SIZE", 10)
+        monkeypatch.setattr(detector, "_MULTIPROCESS_MIN_CHARS", 20)
+        monkeypatch.setattr("os.cpu_count", lambda: 16)
+        monkeypatch.delenv("ANONTOOL_DETECT_WORKERS", raising=False)
+        monkeypatch.delenv("ANONTOOL_SPACY_BATCH_SIZE", raising=False)
+        return calls
+
+    def test_many_texts_stay_in_process(self, pipe_calls):
+        """Texts that are large only in total never start spaCy workers."""
+        _detect_ner_batch(["a" * 15 for _ in range(10)])
+        assert pipe_calls == [(8, 1)]
+
+    def test_single_large_text_uses_processes(self, pipe_calls):
+        _detect_ner_batch(["a" * 45])
+        assert pipe_calls == [(1, 5)]
+
+    def test_caller_can_force_single_process(self, pipe_calls):
+        _detect_ner_batch(["a" * 45], n_process=1)
+        assert pipe_calls == [(8, 1)]
+
 
 # ---------------------------------------------------------------------------
 # Deduplication tests
@@ -153,6 +408,20 @@ class TestDeduplication:
     def test_empty_list(self):
         assert _deduplicate([]) == []
 
+    def test_single_entity_returns_copy(self):
+        entities = [DetectedEntity("John", "PERSON", 0, 4, 0.80, "spacy")]
+        result = _deduplicate(entities)
+        assert result == entities
+        assert result is not entities
+
+    def test_result_sorted_by_start(self):
+        entities = [
+            DetectedEntity("Smith", "PERSON", 10, 15, 0.80, "spacy"),
+            DetectedEntity("John", "PERSON", 0, 4, 0.80, "spacy"),
+        ]
+        result = _deduplicate(entities)
+        assert [e.start for e in result] == [0, 10]
+
     def test_exact_overlap_keeps_higher_confidence(self):
         entities = [
             DetectedEntity("Acme Corp", "ORG", 5, 14, 0.90, "spacy"),
@@ -295,6 +564,36 @@ class TestDetectEntities:
         for ent in entities:
             assert ent.confidence >= 0.65 or len(ent.text.split()) > 1
 
+    def test_lowercase_text_skips_ner(self, monkeypatch):
+        def fail_ner(text):
+            raise AssertionError("NER should not run on lowercase-only text")
+
+        monkeypatch.setattr(detector, "_detect_ner", fail_ner)
+        entities = detect_entities("ping from host 10.0.0.1, contact ops@example.com")
+        assert [e.entity_type for e in entities] == ["EMAIL"]
+
+    def test_batch_matches_single_calls(self, sample_text_mixed, sample_text_no_pii):
+        texts = [sample_text_mixed, "", "mail ops@example.com", sample_text_no_pii]
+        assert detect_entities_batch(texts) == [detect_entities(t) for t in texts]
+
+    def test_batch_skips_ner_for_lowercase_texts(self, monkeypatch):
+        def fail_ner(texts):
+            raise AssertionError("NER should not run on lowercase-only text")
+
+        monkeypatch.setattr(detector, "_detect_ner_batch", fail_ner)
+        result = detect_entities_batch(["call 555-123-4567", "ops@example.com"])
+        assert [[e.entity_type for e in ents] for ents in result] == [
+            ["PHONE"],
+            ["EMAIL"],
+        ]
+
+    def test_has_uppercase(self):
+        assert _has_uppercase("met john Smith") is True
+        assert _has_uppercase("met élodie Élise") is True
+        assert _has_uppercase("all lowercase, 123") is False
+        assert _has_uppercase("tout en minuscules é") is False
+        assert _has_uppercase("") is False
+
     def test_custom_min_confidence(self):
         text = "John Smith is the CEO."
         # With very high threshold, might filter some out
@@ -4,7 +4,87 @@ from pathlib import Path
 
 import pytest
 
-from app.services.anonymizer import anonymize_file, deanonymize_file
+from app.services import anonymizer
+from app.services.anonymizer import (
+    _read_input_text,
+    _read_text_fast,
+    anonymize_bytes,
+    anonymize_file,
+    deanonymize_file,
+)
+
+
+class TestReadInputText:
+    """Tests for reading input files (plain read and mmap paths)."""
+
+    @pytest.fixture(params=["read", "mmap"])
+    def read_mode(self, request, monkeypatch):
+        if request.param == "mmap":
+            monkeypatch.setattr(anonymizer, "_MMAP_MIN_BYTES", 0)
+        return request.param
+
+    def test_reads_utf8(self, tmp_path, read_mode):
+        path = tmp_path / "in.txt"
+        path.write_bytes("Zoë Müller met José.".encode())
+        assert _read_input_text(path) == "Zoë Müller met José."
+
+    def test_normalizes_line_endings(self, tmp_path, read_mode):
+        path = tmp_path / "in.txt"
+        path.write_bytes(b"one\r\ntwo\rthree\n")
+        assert _read_input_text(path) == "one\ntwo\nthree\n"
+
+    def test_empty_file(self, tmp_path, read_mode):
+        path = tmp_path / "empty.txt"
+        path.write_bytes(b"")
+        assert _read_input_text(path) == ""
+
+    def test_invalid_utf8_raises(self, tmp_path, read_mode):
+        path = tmp_path / "bad.txt"
+        path.write_bytes(b"\xff\xfe broken")
+        with pytest.raises(UnicodeDecodeError):
+            _read_input_text(path)
+
+
+class TestReadTextFast:
+    """Tests for the size-hinted reader used by anonymize_folder."""
+
+    def test_matches_read_input_text(self, tmp_path):
+        path = tmp_path / "in.txt"
+        path.write_bytes("Zoë\r\nMüller\r".encode())
+        size = path.stat().st_size
+        assert _read_text_fast(path, size) == _read_input_text(path) == "Zoë\nMüller\n"
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / "empty.txt"
+        path.write_bytes(b"")
+        assert _read_text_fast(path, 0) == ""
+
+    def test_reads_past_stale_size(self, tmp_path, monkeypatch):
+        """A file that grew since it was stat-ed is read to the end."""
+        monkeypatch.setattr(anonymizer, "_READ_CHUNK_BYTES", 1)
+        path = tmp_path / "grown.txt"
+        path.write_bytes("Zoë Müller".encode())
+        # A stale size of 3 would cut the first read inside the "ë"
+        assert _read_text_fast(path, 3) == "Zoë Müller"
+
+    def test_large_file_uses_mmap_path(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(anonymizer, "_MMAP_MIN_BYTES", 1)
+        calls = []
+        monkeypatch.setattr(
+            anonymizer,
+            "_read_input_text",
+            lambda p: calls.append(p) or "mapped",
+        )
+        path = tmp_path / "in.txt"
+        path.write_bytes(b"hello")
+        assert _read_text_fast(path, 5) == "mapped"
+        assert calls == [path]
+
+    def test_invalid_utf8_raises(self, tmp_path):
+        path = tmp_path / "bad.txt"
+        path.write_bytes(b"\xff\xfe broken")
+        with pytest.raises(UnicodeDecodeError):
+            _read_text_fast(path, path.stat().st_size)
 
 
 class TestAnonymizeFile:
@@ -99,6 +179,59 @@ class TestAnonymizeFile:
             )
 
 
+class TestAnonymizeBytes:
+    """Tests for anonymize_bytes (in-memory uploads)."""
+
+    # Lowercase, regex-only PII keeps these tests independent of the NER model
+    _TEXT = "call 555-123-4567 or write to jane@example.com"
+
+    def test_matches_anonymize_file(self, tmp_path, tmp_anontool_dir):
+        input_file = tmp_path / "note.txt"
+        input_file.write_text(self._TEXT)
+        from_file = anonymize_file(
+            input_file,
+            output_path=tmp_path / "from_file.txt",
+            mapping_id="from-file",
+            base_dir=tmp_anontool_dir,
+        )
+
+        from_bytes = anonymize_bytes(
+            self._TEXT.encode(),
+            "note.txt",
+            output_path=tmp_path / "from_bytes.txt",
+            mapping_id="from-bytes",
+            base_dir=tmp_anontool_dir,
+        )
+
+        assert from_bytes["entities_found"] == from_file["entities_found"] == 2
+        assert (tmp_path / "from_bytes.txt").read_text() == (
+            tmp_path / "from_file.txt"
+        ).read_text()
+
+    def test_normalizes_line_endings(self, tmp_path, tmp_anontool_dir):
+        result = anonymize_bytes(
+            b"line one\r\nline two\r",
+            "crlf.txt",
+            output_path=tmp_path / "out.txt",
+            mapping_id="crlf",
+            base_dir=tmp_anontool_dir,
+        )
+        assert Path(result["output_path"]).read_bytes() == b"line one\nline two\n"
+
+    def test_auto_generate_mapping_id(self, tmp_path, tmp_anontool_dir):
+        result = anonymize_bytes(
+            self._TEXT.encode(),
+            "memo.md",
+            output_path=tmp_path / "out.md",
+            base_dir=tmp_anontool_dir,
+        )
+        assert result["mapping_id"].startswith("memo_")
+
+    def test_unsupported_extension(self, tmp_anontool_dir):
+        with pytest.raises(ValueError, match="Unsupported"):
+            anonymize_bytes(b"name,email", "data.csv", base_dir=tmp_anontool_dir)
+
+
 class TestDeanonymizeFile:
     """Tests for deanonymize_file."""
 
@@ -4,107 +4,103 @@ from __future__ import annotations
 
 from pathlib import Path
 
+import pytest
+
 from app.services.anonymizer import (
     anonymize_file,
     anonymize_text,
+    anonymize_texts,
     deanonymize_file,
+    deanonymize_text,
+    get_mapping,
 )
 from app.services.mapping_store import MappingStore
 
-SAMPLES_DIR = Path(__file__).parent / "samples"
+# Sample documents (tests/samples/*.txt by stem), read once at import
+SAMPLES = {
+    path.stem: path.read_text()
+    for path in (Path(__file__).parent / "samples").glob("*.txt")
+}
 
+# Every test here runs NER; take the model load once, up front
+pytestmark = pytest.mark.usefixtures("warm_detector")
 
-class TestSampleDocumentRoundTrips:
-    """Verify full round-trip on all 3 sample documents."""
 
-    def test_business_email_round_trip(self, tmp_path, tmp_anontool_dir):
-        input_file = SAMPLES_DIR / "business_email.txt"
-        original = input_file.read_text()
-        anon_file = tmp_path / "business_email.anon.txt"
-        restored_file = tmp_path / "business_email.restored.txt"
+# Mapping ID used for each sample by the shared round-trip fixture
+SAMPLE_MAPPING_IDS = {
+    "business_email": "integ-biz",
+    "meeting_notes": "integ-meeting",
+    "project_report": "integ-report",
+}
 
-        # Anonymize
-        anon_result = anonymize_file(
-            input_file,
-            output_path=anon_file,
-            mapping_id="integ-biz",
-            base_dir=tmp_anontool_dir,
-        )
-        anon_content = anon_file.read_text()
 
-        # Verify real names are removed
-        assert "Robert Garcia" not in anon_content
-        assert "Lisa Wang" not in anon_content
-        assert "robert.garcia@techstart.io" not in anon_content
-        assert anon_result["entities_found"] >= 3
+@pytest.fixture(scope="module")
+def anonymized_samples(tmp_path_factory):
+    """Anonymize all samples in one batched pass, shared by the module."""
+    base_dir = tmp_path_factory.mktemp("anontool")
+    names = list(SAMPLE_MAPPING_IDS)
+    results = anonymize_texts(
+        [SAMPLES[name] for name in names],
+        [SAMPLE_MAPPING_IDS[name] for name in names],
+        base_dir=base_dir,
+    )
+    return base_dir, dict(zip(names, results))
 
-        # De-anonymize
-        deanonymize_file(
-            anon_file,
-            mapping_id="integ-biz",
-            output_path=restored_file,
-            base_dir=tmp_anontool_dir,
-        )
 
-        assert restored_file.read_text() == original
-
-    def test_meeting_notes_round_trip(self, tmp_path, tmp_anontool_dir):
-        input_file = SAMPLES_DIR / "meeting_notes.txt"
-        original = input_file.read_text()
-        anon_file = tmp_path / "meeting_notes.anon.txt"
-        restored_file = tmp_path / "meeting_notes.restored.txt"
+class TestSampleDocumentRoundTrips:
+    """Verify full round-trip on all 3 sample documents."""
 
-        anon_result = anonymize_file(
-            input_file,
-            output_path=anon_file,
-            mapping_id="integ-meeting",
-            base_dir=tmp_anontool_dir,
-        )
-        anon_content = anon_file.read_text()
+    @pytest.mark.parametrize(
+        "sample, forbidden, min_entities",
+        [
+            (
+                "business_email",
+                ["Robert Garcia", "Lisa Wang", "robert.garcia@techstart.io"],
+                3,
+            ),
+            ("meeting_notes", ["Alice Martinez", "Bob Thompson"], 4),
+            ("project_report", ["Elena Rodriguez", "Thomas Wright"], 5),
+        ],
+        ids=["business_email", "meeting_notes", "project_report"],
+    )
+    def test_sample_round_trip(
+        self, anonymized_samples, sample, forbidden, min_entities
+    ):
+        base_dir, results = anonymized_samples
+        result = results[sample]
 
-        # Verify names are removed
-        assert "Alice Martinez" not in anon_content
-        assert "Bob Thompson" not in anon_content
-        assert anon_result["entities_found"] >= 4
+        # Verify real names are removed
+        for value in forbidden:
+            assert value not in result.anonymized_text
+        assert len(result.entities_found) >= min_entities
 
         # De-anonymize
-        deanonymize_file(
-            anon_file,
-            mapping_id="integ-meeting",
-            output_path=restored_file,
-            base_dir=tmp_anontool_dir,
+        restored = deanonymize_text(
+            result.anonymized_text, SAMPLE_MAPPING_IDS[sample], base_dir=base_dir
         )
+        assert restored == SAMPLES[sample]
 
-        assert restored_file.read_text() == original
-
-    def test_project_report_round_trip(self, tmp_path, tmp_anontool_dir):
-        input_file = SAMPLES_DIR / "project_report.txt"
-        original = input_file.read_text()
-        anon_file = tmp_path / "project_report.anon.txt"
-        restored_file = tmp_path / "project_report.restored.txt"
+    def test_file_round_trip(self, tmp_path, tmp_anontool_dir):
+        """The file-based API round-trips a sample byte for byte."""
+        input_file = tmp_path / "business_email.txt"
+        input_file.write_text(SAMPLES["business_email"])
+        anon_file = tmp_path / "business_email.anon.txt"
+        restored_file = tmp_path / "business_email.restored.txt"
 
-        anon_result = anonymize_file(
+        anonymize_file(
             input_file,
             output_path=anon_file,
-            mapping_id="integ-report",
+            mapping_id="integ-file",
             base_dir=tmp_anontool_dir,
         )
-        anon_content = anon_file.read_text()
-
-        # Verify names are removed
-        assert "Elena Rodriguez" not in anon_content
-        assert "Thomas Wright" not in anon_content
-        assert anon_result["entities_found"] >= 5
-
-        # De-anonymize
         deanonymize_file(
             anon_file,
-            mapping_id="integ-report",
+            mapping_id="integ-file",
             output_path=restored_file,
             base_dir=tmp_anontool_dir,
         )
 
-        assert restored_file.read_text() == original
+        assert restored_file.read_text() == SAMPLES["business_email"]
 
 
 class TestMappingPersistence:
@@ -137,10 +133,12 @@ class TestMappingPersistence:
             base_dir=tmp_anontool_dir,
         )
 
-        # Load the mapping and verify Robert Garcia has the same pseudonym
-        store = MappingStore(base_dir=tmp_anontool_dir)
-        store.create_or_load("shared-map")
-        entries = store.get_entries()
+        # Check the live mapping: Robert Garcia has the same pseudonym
+        entries = get_mapping("shared-map", tmp_anontool_dir).get_entries()
+
+        # The shared mapping was also persisted: a fresh load from disk agrees
+        saved = MappingStore(base_dir=tmp_anontool_dir)
+        assert saved.create_or_load("shared-map")["entries"] == entries
 
         # Robert Garcia should appear once in the mapping
         if "Robert Garcia" in entries:
@@ -171,8 +169,7 @@ class TestOutputVerification:
     def test_no_real_names_in_anonymized_business_email(
         self, tmp_anontool_dir
     ):
-        input_file = SAMPLES_DIR / "business_email.txt"
-        text = input_file.read_text()
+        text = SAMPLES["business_email"]
         result = anonymize_text(text, "verify-biz", base_dir=tmp_anontool_dir)
 
         real_names = [
@@ -185,8 +182,7 @@ class TestOutputVerification:
             assert name not in result.anonymized_text
 
     def test_no_real_emails_in_anonymized_output(self, tmp_anontool_dir):
-        input_file = SAMPLES_DIR / "business_email.txt"
-        text = input_file.read_text()
+        text = SAMPLES["business_email"]
         result = anonymize_text(
             text, "verify-emails", base_dir=tmp_anontool_dir
         )
@@ -202,10 +198,7 @@ class TestOutputVerification:
     def test_pseudonyms_are_consistent_format(self, tmp_anontool_dir):
         text = "John Smith and Jane Doe from Acme Corp contacted bob@test.com."
         anonymize_text(text, "format-check", base_dir=tmp_anontool_dir)
-
-        store = MappingStore(base_dir=tmp_anontool_dir)
-        store.create_or_load("format-check")
-        entries = store.get_entries()
+        entries = get_mapping("format-check", tmp_anontool_dir).get_entries()
 
         for info in entries.values():
             pseudonym = info["pseudonym"]
@@ -0,0 +1,35 @@
+"""Tests for the JSON encode/decode helpers."""
+
+import json
+
+import pytest
+
+from app.services import jsonio
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def backend(request, monkeypatch):
+    """Run each test with orjson and with the stdlib fallback."""
+    if request.param == "stdlib":
+        monkeypatch.setattr(jsonio, "orjson", None)
+    elif jsonio.orjson is None:
+        pytest.skip("orjson not installed")
+    return request.param
+
+
+class TestJsonIO:
+    """Tests for loads/dumps with either backend."""
+
+    def test_round_trip(self, backend):
+        data = {"entries": {"Zoë Müller": {"pseudonym": "Person_A", "type": "PERSON"}}}
+        assert jsonio.loads(jsonio.dumps(data)) == data
+
+    def test_dumps_returns_bytes(self, backend):
+        assert isinstance(jsonio.dumps({"a": 1}), bytes)
+
+    def test_indent_matches_stdlib(self, backend):
+        data = {"mapping_id": "x", "entries": {"A": {"pseudonym": "Person_A"}}}
+        assert jsonio.dumps(data, indent=True).decode() == json.dumps(data, indent=2)
+
+    def test_loads_accepts_memoryview(self, backend):
+        assert jsonio.loads(memoryview(b'{"a": [1, 2]}')) == {"a": [1, 2]}
@@ -1,10 +1,15 @@
 """Tests for the JSON mapping store."""
 
 import json
+import threading
 
 import pytest
 
-from app.services.mapping_store import MappingStore, _next_letter_label
+from app.services import mapping_store
+from app.services.mapping_store import (
+    MappingStore,
+    _next_letter_label,
+)
 
 
 class TestNextLetterLabel:
@@ -60,49 +65,72 @@ class TestMappingStoreCreateLoad:
 class TestGetPseudonym:
     """Tests for pseudonym generation and lookup."""
 
-    def test_person_first(self, tmp_anontool_dir):
+    @pytest.fixture
+    def fresh_store(self, tmp_anontool_dir):
         store = MappingStore(base_dir=tmp_anontool_dir)
         store.create_or_load("test")
-        assert store.get_pseudonym("John Smith", "PERSON") == "Person_A"
-
-    def test_person_second(self, tmp_anontool_dir):
+        return store
+
+    @pytest.mark.parametrize(
+        "calls, expected",
+        [
+            ([("John Smith", "PERSON")], ["Person_A"]),
+            (
+                [("John Smith", "PERSON"), ("Jane Doe", "PERSON")],
+                ["Person_A", "Person_B"],
+            ),
+            (
+                [("John Smith", "PERSON"), ("John Smith", "PERSON")],
+                ["Person_A", "Person_A"],
+            ),
+            (
+                [("Acme Corp", "ORG"), ("Globex Inc", "ORG")],
+                ["Company_1", "Company_2"],
+            ),
+            ([("john@example.com", "EMAIL")], ["Email_1"]),
+            ([("(555) 123-4567", "PHONE")], ["Phone_1"]),
+            # Each type counts independently of the others
+            (
+                [
+                    ("John Smith", "PERSON"),
+                    ("Acme Corp", "ORG"),
+                    ("Jane Doe", "PERSON"),
+                    ("Globex Inc", "ORG"),
+                ],
+                ["Person_A", "Company_1", "Person_B", "Company_2"],
+            ),
+        ],
+        ids=[
+            "person_first",
+            "person_second",
+            "same_name_same_pseudonym",
+            "org",
+            "email",
+            "phone",
+            "mixed_types_independent_counters",
+        ],
+    )
+    def test_pseudonym_sequence(self, fresh_store, calls, expected):
+        assert [fresh_store.get_pseudonym(name, t) for name, t in calls] == expected
+
+    def test_counters_resume_after_reload(self, tmp_anontool_dir):
         store = MappingStore(base_dir=tmp_anontool_dir)
-        store.create_or_load("test")
+        store.create_or_load("resume")
         store.get_pseudonym("John Smith", "PERSON")
-        assert store.get_pseudonym("Jane Doe", "PERSON") == "Person_B"
-
-    def test_same_name_returns_same_pseudonym(self, tmp_anontool_dir):
-        store = MappingStore(base_dir=tmp_anontool_dir)
-        store.create_or_load("test")
-        p1 = store.get_pseudonym("John Smith", "PERSON")
-        p2 = store.get_pseudonym("John Smith", "PERSON")
-        assert p1 == p2 == "Person_A"
-
-    def test_org_pseudonym(self, tmp_anontool_dir):
-        store = MappingStore(base_dir=tmp_anontool_dir)
-        store.create_or_load("test")
-        assert store.get_pseudonym("Acme Corp", "ORG") == "Company_1"
-        assert store.get_pseudonym("Globex Inc", "ORG") == "Company_2"
-
-    def test_email_pseudonym(self, tmp_anontool_dir):
-        store = MappingStore(base_dir=tmp_anontool_dir)
-        store.create_or_load("test")
-        assert store.get_pseudonym("john@example.com", "EMAIL") == "Email_1"
+        store.get_pseudonym("Acme Corp", "ORG")
+        store.save()
 
-    def test_phone_pseudonym(self, tmp_anontool_dir):
-        store = MappingStore(base_dir=tmp_anontool_dir)
-        store.create_or_load("test")
-        assert store.get_pseudonym("(555) 123-4567", "PHONE") == "Phone_1"
+        reloaded = MappingStore(base_dir=tmp_anontool_dir)
+        reloaded.create_or_load("resume")
+        assert reloaded.get_pseudonym("Jane Doe", "PERSON") == "Person_B"
+        assert reloaded.get_pseudonym("Globex Inc", "ORG") == "Company_2"
 
-    def test_mixed_types_independent_counters(self, tmp_anontool_dir):
+    def test_counters_reset_on_new_mapping(self, tmp_anontool_dir):
         store = MappingStore(base_dir=tmp_anontool_dir)
-        store.create_or_load("test")
+        store.create_or_load("first")
         store.get_pseudonym("John Smith", "PERSON")
-        store.get_pseudonym("Acme Corp", "ORG")
-        # Second person should be B, not affected by the ORG entry
-        assert store.get_pseudonym("Jane Doe", "PERSON") == "Person_B"
-        # Second org should be 2
-        assert store.get_pseudonym("Globex Inc", "ORG") == "Company_2"
+        store.create_or_load("second")
+        assert store.get_pseudonym("Jane Doe", "PERSON") == "Person_A"
 
 
 class TestSaveAndPersist:
@@ -137,6 +165,192 @@ class TestSaveAndPersist:
         assert data["entries"]["Bob Thompson"]["pseudonym"] == "Person_A"
         assert data["entries"]["Bob Thompson"]["type"] == "PERSON"
 
+    def test_save_leaves_no_temp_file(self, tmp_anontool_dir):
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        store.create_or_load("atomic")
+        store.get_pseudonym("Bob Thompson", "PERSON")
+        store.save()
+        store.get_pseudonym("Sarah Chen", "PERSON")
+        store.save()
+
+        files = sorted(p.name for p in (tmp_anontool_dir / "mappings").iterdir())
+        assert files == ["atomic.json"]
+
+    def test_failed_save_keeps_previous_file(self, tmp_anontool_dir, monkeypatch):
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        store.create_or_load("atomic")
+        store.get_pseudonym("Bob Thompson", "PERSON")
+        path = store.save()
+        before = path.read_bytes()
+
+        def fail_replace(src, dst):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(mapping_store.os, "replace", fail_replace)
+        store.get_pseudonym("Sarah Chen", "PERSON")
+        with pytest.raises(OSError):
+            store.save()
+
+        assert path.read_bytes() == before
+        assert [p.name for p in path.parent.iterdir()] == ["atomic.json"]
+
+    def test_save_with_fsync(self, tmp_anontool_dir, monkeypatch):
+        synced = []
+        monkeypatch.setattr(mapping_store.os, "fsync", synced.append)
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        store.create_or_load("durable")
+        store.save()
+        assert synced == []
+        store.save(fsync=True)
+        assert len(synced) == 1
+
+    def test_concurrent_saves_to_one_mapping(self, tmp_anontool_dir):
+        """Separate stores saving the same mapping never collide on a temp file."""
+        stores = []
+        for i in range(4):
+            store = MappingStore(base_dir=tmp_anontool_dir)
+            store.create_or_load("contended")
+            store.get_pseudonym(f"Name {i}", "PERSON")
+            stores.append(store)
+        errors = []
+
+        def worker(store):
+            try:
+                for _ in range(25):
+                    store.save()
+            except OSError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(s,)) for s in stores]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        files = [p.name for p in (tmp_anontool_dir / "mappings").iterdir()]
+        assert files == ["contended.json"]
+        json.loads((tmp_anontool_dir / "mappings" / "contended.json").read_text())
+
+    def test_non_ascii_names_round_trip(self, tmp_anontool_dir):
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        store.create_or_load("unicode")
+        store.get_pseudonym("José Núñez", "PERSON")
+        store.save()
+
+        reloaded = MappingStore(base_dir=tmp_anontool_dir)
+        reloaded.create_or_load("unicode")
+        assert reloaded.get_entries()["José Núñez"]["pseudonym"] == "Person_A"
+
+    def test_loads_stdlib_written_file(self, tmp_anontool_dir):
+        path = tmp_anontool_dir / "mappings" / "legacy.json"
+        path.write_text(json.dumps({
+            "mapping_id": "legacy",
+            "entries": {"Zoë Ng": {"pseudonym": "Person_A", "type": "PERSON"}},
+        }, indent=2))
+
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        store.create_or_load("legacy")
+        assert store.get_pseudonym("Zoë Ng", "PERSON") == "Person_A"
+
+    def test_large_file_loaded_via_mmap(self, tmp_anontool_dir, monkeypatch):
+        monkeypatch.setattr(mapping_store, "_MMAP_MIN_BYTES", 0)
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        store.create_or_load("mapped")
+        store.get_pseudonym("José Núñez", "PERSON")
+        store.save()
+
+        reloaded = MappingStore(base_dir=tmp_anontool_dir)
+        reloaded.create_or_load("mapped")
+        assert reloaded.get_entries() == store.get_entries()
+
+
+class TestIsStale:
+    """Tests for detecting on-disk changes to a loaded mapping."""
+
+    def test_fresh_after_load_and_save(self, tmp_anontool_dir):
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        store.create_or_load("stale-test")
+        assert store.is_stale() is False
+        store.save()
+        assert store.is_stale() is False
+
+    def test_stale_after_external_write(self, tmp_anontool_dir):
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        store.create_or_load("stale-test")
+        store.save()
+
+        other = MappingStore(base_dir=tmp_anontool_dir)
+        other.create_or_load("stale-test")
+        other.get_pseudonym("Alice Martinez", "PERSON")
+        other.save()
+
+        assert store.is_stale() is True
+
+    def test_stale_after_delete(self, tmp_anontool_dir):
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        store.create_or_load("stale-test")
+        store.save().unlink()
+        assert store.is_stale() is True
+
+
+class TestOpenCached:
+    """Tests for the process-wide shared stores."""
+
+    def test_same_instance_per_mapping(self, tmp_anontool_dir):
+        first = MappingStore.open_cached("shared", tmp_anontool_dir)
+        assert MappingStore.open_cached("shared", tmp_anontool_dir) is first
+        assert MappingStore.open_cached("other", tmp_anontool_dir) is not first
+
+    def test_reloads_when_stale(self, tmp_anontool_dir):
+        cached = MappingStore.open_cached("shared-ext", tmp_anontool_dir)
+        cached.save()
+
+        other = MappingStore(base_dir=tmp_anontool_dir)
+        other.create_or_load("shared-ext")
+        other.get_pseudonym("Alice Martinez", "PERSON")
+        other.save()
+
+        store = MappingStore.open_cached("shared-ext", tmp_anontool_dir)
+        assert store is cached
+        assert "Alice Martinez" in store.get_entries()
+
+    def test_evicts_oldest(self, tmp_anontool_dir, monkeypatch):
+        monkeypatch.setattr(mapping_store, "_STORE_CACHE", {})
+        monkeypatch.setattr(mapping_store, "_STORE_CACHE_MAX", 2)
+        first = MappingStore.open_cached("one", tmp_anontool_dir)
+        MappingStore.open_cached("two", tmp_anontool_dir)
+        MappingStore.open_cached("three", tmp_anontool_dir)
+        assert MappingStore.open_cached("one", tmp_anontool_dir) is not first
+
+    def test_hit_refreshes_recency(self, tmp_anontool_dir, monkeypatch):
+        monkeypatch.setattr(mapping_store, "_STORE_CACHE", {})
+        monkeypatch.setattr(mapping_store, "_STORE_CACHE_MAX", 2)
+        first = MappingStore.open_cached("one", tmp_anontool_dir)
+        MappingStore.open_cached("two", tmp_anontool_dir)
+        MappingStore.open_cached("one", tmp_anontool_dir)
+        MappingStore.open_cached("three", tmp_anontool_dir)
+        assert MappingStore.open_cached("one", tmp_anontool_dir) is first
+
+    def test_concurrent_pseudonyms_unique(self, tmp_anontool_dir):
+        """Threads sharing a store never hand two names the same pseudonym."""
+        store = MappingStore.open_cached("threaded", tmp_anontool_dir)
+        names = [f"Name {i}" for i in range(400)]
+
+        def worker(offset):
+            for name in names[offset::8]:
+                store.get_pseudonym(name, "PERSON")
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        pseudonyms = [e["pseudonym"] for e in store.get_entries().values()]
+        assert len(pseudonyms) == len(names)
+        assert len(set(pseudonyms)) == len(names)
+
 
 class TestReverseLookup:
     """Tests for reverse lookup (pseudonym -> real name)."""
@@ -150,6 +364,54 @@ class TestReverseLookup:
         assert reverse["Person_A"] == "John Smith"
         assert reverse["Company_1"] == "Acme Corp"
 
+    def test_reverse_lookup_cached_and_updated(self, tmp_anontool_dir):
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        store.create_or_load("reverse-cache")
+        store.get_pseudonym("John Smith", "PERSON")
+        reverse = store.get_reverse_lookup()
+        assert store.get_reverse_lookup() is reverse
+
+        store.get_pseudonym("Acme Corp", "ORG")
+        assert store.get_reverse_lookup() == {
+            "Person_A": "John Smith",
+            "Company_1": "Acme Corp",
+        }
+
+    def test_reverse_lookup_reset_on_load(self, tmp_anontool_dir):
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        store.create_or_load("first")
+        store.get_pseudonym("John Smith", "PERSON")
+        store.get_reverse_lookup()
+        store.create_or_load("second")
+        assert store.get_reverse_lookup() == {}
+
+
+class TestReplacers:
+    """Tests for the cached forward/reverse replacers."""
+
+    def test_forward_and_reverse(self, tmp_anontool_dir):
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        store.create_or_load("repl-test")
+        store.get_pseudonym("John Smith", "PERSON")
+        store.get_pseudonym("Acme Corp", "ORG")
+        anon = store.get_replacer()("John Smith joined Acme Corp.")
+        assert anon == "Person_A joined Company_1."
+        assert store.get_reverse_replacer()(anon) == "John Smith joined Acme Corp."
+
+    def test_replacer_cached(self, tmp_anontool_dir):
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        store.create_or_load("repl-test")
+        store.get_pseudonym("John Smith", "PERSON")
+        assert store.get_replacer() is store.get_replacer()
+
+    def test_new_entry_invalidates(self, tmp_anontool_dir):
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        store.create_or_load("repl-test")
+        store.get_pseudonym("John Smith", "PERSON")
+        store.get_replacer()
+        store.get_pseudonym("Jane Doe", "PERSON")
+        assert store.get_replacer()("Jane Doe") == "Person_B"
+
 
 class TestListMappings:
     """Tests for listing available mappings."""
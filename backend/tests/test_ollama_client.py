@@ -1,17 +1,25 @@
-"""Tests for the Ollama client with mocked HTTP responses."""
+"""Tests for the Ollama client against an httpx.MockTransport fake server."""
 
 from __future__ import annotations
 
 import json
-from unittest.mock import MagicMock, patch
 
 import httpx
 import pytest
 
+from app.services import ollama_client
 from app.services.detector import DetectedEntity
 from app.services.ollama_client import OllamaClient
 
 
+@pytest.fixture(autouse=True)
+def _clear_availability_cache():
+    """Start every test without cached availability probes."""
+    ollama_client._availability_cache.clear()
+    yield
+    ollama_client._availability_cache.clear()
+
+
 @pytest.fixture
 def sample_entities():
     """Sample entities for verification tests."""
@@ -22,113 +30,272 @@ def sample_entities():
     ]
 
 
+# LLM answers used below, serialized once at import
+ALL_VALID = json.dumps([
+    {"text": "John Smith", "is_valid": True, "entity_type": "PERSON"},
+    {"text": "Acme Corp", "is_valid": True, "entity_type": "ORG"},
+    {"text": "john@example.com", "is_valid": True, "entity_type": "EMAIL"},
+])
+ACME_INVALID = json.dumps([
+    {"text": "John Smith", "is_valid": True, "entity_type": "PERSON"},
+    {"text": "Acme Corp", "is_valid": False, "entity_type": "ORG"},
+    {"text": "john@example.com", "is_valid": True, "entity_type": "EMAIL"},
+])
+TYPE_CORRECTIONS = json.dumps([
+    {"text": "John Smith", "is_valid": True, "entity_type": "PERSON"},
+    {"text": "Acme Corp", "is_valid": True, "entity_type": "PERSON"},
+    {"text": "john@example.com", "is_valid": True, "entity_type": "BOGUS"},
+])
+MARKDOWN_WRAPPED = (
+    '```json\n[\n{"text": "John Smith", "is_valid": true, "entity_type": "PERSON"}\n]\n```'
+)
+PROSE_BEFORE = (
+    "Here is the result:\n"
+    '[{"text": "Acme Corp", "is_valid": true, "entity_type": "ORG"}]'
+)
+NOT_JSON = "This is not valid JSON at all"
+TRAILING_CHATTER = (
+    '[{"text": "John Smith", "is_valid": true, "entity_type": "PERSON"}]'
+    "\n\nLet me know if you need anything else!"
+)
+BATCH_TWO_DOCS = json.dumps([
+    [
+        {"text": "John Smith", "is_valid": True, "entity_type": "PERSON"},
+        {"text": "Acme Corp", "is_valid": False, "entity_type": "ORG"},
+    ],
+    [{"text": "john@example.com", "is_valid": True, "entity_type": "EMAIL"}],
+])
+BATCH_ONE_DOC = json.dumps([
+    [{"text": "John Smith", "is_valid": True, "entity_type": "PERSON"}],
+])
+BATCH_EMPTY = json.dumps([[]])
+
+
+class FakeOllama:
+    """Ollama server stand-in behind an httpx.MockTransport.
+
+    /api/tags answers with tags_status; /api/generate streams llm_text as
+    NDJSON chunks the way Ollama streams tokens. Setting error makes every
+    request raise it instead.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget recorded requests and restore the default behaviour."""
+        self.requests: list[httpx.Request] = []
+        self.tags_status = 200
+        self.llm_text = ""
+        self.chunk_size = 7
+        self.error: Exception | None = None
+        # NDJSON lines of the last /api/generate response the client read
+        self.lines_sent = 0
+
+    def generate_requests(self) -> list[httpx.Request]:
+        return [r for r in self.requests if r.url.path == "/api/generate"]
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.error is not None:
+            raise self.error
+        if request.url.path == "/api/tags":
+            return httpx.Response(self.tags_status)
+        return httpx.Response(200, content=self._stream())
+
+    def _stream(self):
+        text, size = self.llm_text, self.chunk_size
+        lines = [
+            json.dumps({"response": text[i:i + size], "done": False})
+            for i in range(0, len(text), size)
+        ]
+        lines.append(json.dumps({"response": "", "done": True}))
+        self.lines_sent = 0
+        for line in lines:
+            self.lines_sent += 1
+            yield f"{line}\n".encode()
+
+    @property
+    def total_lines(self) -> int:
+        return -(-len(self.llm_text) // self.chunk_size) + 1
+
+
+@pytest.fixture(scope="module")
+def _fake_server():
+    """One FakeOllama and httpx.Client for the module, built once."""
+    fake = FakeOllama()
+    client = httpx.Client(transport=httpx.MockTransport(fake.handler))
+    yield fake, client
+    client.close()
+
+
+@pytest.fixture
+def fake_ollama(_fake_server, monkeypatch):
+    """Point every OllamaClient at the shared FakeOllama, reset for this test."""
+    fake, client = _fake_server
+    fake.reset()
+    monkeypatch.setattr(ollama_client, "_SHARED_CLIENT", client)
+    return fake
+
+
 class TestIsAvailable:
     """Tests for Ollama availability checking."""
 
-    def test_available_when_running(self):
+    def test_available_when_running(self, fake_ollama):
         client = OllamaClient(url="http://localhost:11434")
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-
-        with patch.object(client._client, "get", return_value=mock_response):
-            assert client.is_available() is True
+        assert client.is_available() is True
 
-    def test_unavailable_when_connection_refused(self):
+    def test_unavailable_when_connection_refused(self, fake_ollama):
+        fake_ollama.error = httpx.ConnectError("refused")
         client = OllamaClient(url="http://localhost:99999")
-        with patch.object(
-            client._client, "get", side_effect=httpx.ConnectError("refused")
-        ):
-            assert client.is_available() is False
+        assert client.is_available() is False
 
-    def test_unavailable_on_timeout(self):
+    def test_unavailable_on_timeout(self, fake_ollama):
+        fake_ollama.error = httpx.TimeoutException("timeout")
         client = OllamaClient(url="http://localhost:11434")
-        with patch.object(
-            client._client, "get", side_effect=httpx.TimeoutException("timeout")
-        ):
-            assert client.is_available() is False
+        assert client.is_available() is False
+
+    def test_unavailable_on_error_status(self, fake_ollama):
+        fake_ollama.tags_status = 500
+        assert OllamaClient(url="http://localhost:11434").is_available() is False
+
+    def test_result_cached(self, fake_ollama):
+        client = OllamaClient(url="http://localhost:11434")
+        assert client.is_available() is True
+        assert OllamaClient(url="http://localhost:11434").is_available() is True
+        assert len(fake_ollama.requests) == 1
+
+    def test_cache_expires(self, fake_ollama, monkeypatch):
+        fake_ollama.error = httpx.ConnectError("refused")
+        client = OllamaClient(url="http://localhost:11434")
+        assert client.is_available() is False
+        monkeypatch.setattr(ollama_client, "_AVAILABILITY_TTL", 0.0)
+        assert client.is_available() is False
+        assert len(fake_ollama.requests) == 2
 
 
 class TestVerifyEntities:
     """Tests for entity verification with mocked LLM responses."""
 
-    def test_all_valid(self, sample_entities):
-        client = OllamaClient()
-        llm_response = json.dumps([
-            {"text": "John Smith", "is_valid": True, "entity_type": "PERSON"},
-            {"text": "Acme Corp", "is_valid": True, "entity_type": "ORG"},
-            {"text": "john@example.com", "is_valid": True, "entity_type": "EMAIL"},
-        ])
-
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {"response": llm_response}
-        mock_response.raise_for_status = MagicMock()
-
-        with patch.object(client._client, "post", return_value=mock_response):
-            result = client.verify_entities("some text", sample_entities)
-            assert len(result) == 3
-
-    def test_filters_invalid(self, sample_entities):
-        client = OllamaClient()
-        llm_response = json.dumps([
-            {"text": "John Smith", "is_valid": True, "entity_type": "PERSON"},
-            {"text": "Acme Corp", "is_valid": False, "entity_type": "ORG"},
-            {"text": "john@example.com", "is_valid": True, "entity_type": "EMAIL"},
-        ])
-
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {"response": llm_response}
-        mock_response.raise_for_status = MagicMock()
-
-        with patch.object(client._client, "post", return_value=mock_response):
-            result = client.verify_entities("some text", sample_entities)
-            assert len(result) == 2
-            assert all(e.text != "Acme Corp" for e in result)
-
-    def test_empty_entities_returns_empty(self):
-        client = OllamaClient()
-        result = client.verify_entities("some text", [])
-        assert result == []
+    @pytest.mark.parametrize(
+        ("response", "expected"),
+        [
+            (ALL_VALID, ["John Smith", "Acme Corp", "john@example.com"]),
+            (ACME_INVALID, ["John Smith", "john@example.com"]),
+            # Entities the answer leaves out are kept
+            (MARKDOWN_WRAPPED, ["John Smith", "Acme Corp", "john@example.com"]),
+            (PROSE_BEFORE, ["John Smith", "Acme Corp", "john@example.com"]),
+            # Unparseable answers fall back to the originals
+            (NOT_JSON, ["John Smith", "Acme Corp", "john@example.com"]),
+        ],
+        ids=["all-valid", "filters-invalid", "markdown", "prose-before", "not-json"],
+    )
+    def test_parses_response(self, fake_ollama, sample_entities, response, expected):
+        fake_ollama.llm_text = response
+        result = OllamaClient().verify_entities("some text", sample_entities)
+        assert [e.text for e in result] == expected
+
+    def test_applies_type_corrections(self, fake_ollama, sample_entities):
+        fake_ollama.llm_text = TYPE_CORRECTIONS
+        result = OllamaClient().verify_entities("some text", sample_entities)
 
-    def test_fallback_on_http_error(self, sample_entities):
-        client = OllamaClient()
-        with patch.object(
-            client._client,
-            "post",
-            side_effect=httpx.ConnectError("connection failed"),
-        ):
-            result = client.verify_entities("some text", sample_entities)
-            # Should return originals on error
-            assert len(result) == 3
-
-    def test_fallback_on_invalid_json(self, sample_entities):
-        client = OllamaClient()
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            "response": "This is not valid JSON at all"
-        }
-        mock_response.raise_for_status = MagicMock()
-
-        with patch.object(client._client, "post", return_value=mock_response):
-            result = client.verify_entities("some text", sample_entities)
-            # Should fallback to originals
-            assert len(result) == 3
-
-    def test_handles_markdown_wrapped_json(self, sample_entities):
-        client = OllamaClient()
-        llm_response = '```json\n[\n{"text": "John Smith", "is_valid": true, "entity_type": "PERSON"}\n]\n```'
+        assert [e.entity_type for e in result] == ["PERSON", "PERSON", "EMAIL"]
+        # The caller's entities are left untouched
+        assert sample_entities[1].entity_type == "ORG"
+
+    def test_empty_entities_returns_empty(self, fake_ollama):
+        assert OllamaClient().verify_entities("some text", []) == []
+        assert fake_ollama.requests == []
+
+    def test_fallback_on_http_error(self, fake_ollama, sample_entities):
+        fake_ollama.error = httpx.ConnectError("connection failed")
+        result = OllamaClient().verify_entities("some text", sample_entities)
+        # Should return originals on error
+        assert len(result) == 3
 
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {"response": llm_response}
-        mock_response.raise_for_status = MagicMock()
+    def test_stops_reading_when_array_closes(self, fake_ollama, sample_entities):
+        fake_ollama.llm_text = TRAILING_CHATTER
+        fake_ollama.chunk_size = 10
+        result = OllamaClient().verify_entities("some text", sample_entities)
 
-        with patch.object(client._client, "post", return_value=mock_response):
-            result = client.verify_entities("some text", sample_entities)
-            assert len(result) == 1
-            assert result[0].text == "John Smith"
+        # Acme Corp and the email are kept: the answer never rejected them
+        assert result == sample_entities
+        # The trailing chatter and the final "done" line were never read
+        assert fake_ollama.lines_sent < fake_ollama.total_lines
+
+    def test_sends_streaming_generate_request(self, fake_ollama, sample_entities):
+        fake_ollama.llm_text = ALL_VALID
+        OllamaClient(model="custom-model").verify_entities("some text", sample_entities)
+
+        (request,) = fake_ollama.generate_requests()
+        body = json.loads(request.content)
+        assert request.method == "POST"
+        assert body["model"] == "custom-model"
+        assert body["stream"] is True
+        assert "some text" in body["prompt"]
+
+
+class TestVerifyEntitiesBatch:
+    """Tests for verifying several documents in one request."""
+
+    def test_single_request_for_all_documents(self, fake_ollama, sample_entities):
+        fake_ollama.llm_text = BATCH_TWO_DOCS
+        items = [("doc one", sample_entities[:2]), ("doc two", sample_entities[2:])]
+
+        result = OllamaClient().verify_entities_batch(items)
+
+        assert len(fake_ollama.generate_requests()) == 1
+        assert [e.text for e in result[0]] == ["John Smith"]
+        assert [e.text for e in result[1]] == ["john@example.com"]
+
+    def test_documents_without_entities_skipped(self, fake_ollama, sample_entities):
+        fake_ollama.llm_text = BATCH_ONE_DOC
+        items = [("empty", []), ("doc", sample_entities[:1])]
+
+        result = OllamaClient().verify_entities_batch(items)
+
+        (request,) = fake_ollama.generate_requests()
+        assert "empty" not in json.loads(request.content)["prompt"]
+        assert result == [[], sample_entities[:1]]
+
+    def test_mismatched_response_keeps_originals(self, fake_ollama, sample_entities):
+        fake_ollama.llm_text = BATCH_EMPTY
+        items = [("doc one", sample_entities[:2]), ("doc two", sample_entities[2:])]
+
+        result = OllamaClient().verify_entities_batch(items)
+
+        assert result == [sample_entities[:2], sample_entities[2:]]
+
+    def test_fallback_on_http_error(self, fake_ollama, sample_entities):
+        fake_ollama.error = httpx.ConnectError("failed")
+        items = [("doc", sample_entities)]
+        assert OllamaClient().verify_entities_batch(items) == [sample_entities]
+
+    def test_large_folders_split_into_several_requests(
+        self, fake_ollama, sample_entities, monkeypatch
+    ):
+        monkeypatch.setattr(ollama_client, "_BATCH_MAX_CHARS", 10)
+        fake_ollama.llm_text = BATCH_ONE_DOC
+        items = [("x" * 8, sample_entities[:1]), ("y" * 8, sample_entities[:1])]
+
+        result = OllamaClient().verify_entities_batch(items)
+
+        assert len(fake_ollama.generate_requests()) == 2
+        assert result == [sample_entities[:1], sample_entities[:1]]
+
+
+class TestJsonArrayScanner:
+    """Tests for detecting the end of a streamed JSON array."""
+
+    def test_closes_on_balanced_array(self):
+        scanner = ollama_client._JsonArrayScanner()
+        assert scanner.feed('Here: [[{"a": 1}], ') is None
+        assert scanner.feed("[]] Done.") == 3
+
+    def test_ignores_brackets_in_strings(self):
+        scanner = ollama_client._JsonArrayScanner()
+        assert scanner.feed('[{"text": "Acme ]UK[ \\"Ltd]\\""') is None
+        assert scanner.feed("}]") == 2
 
 
 class TestOllamaConfig:
@@ -150,3 +317,8 @@ class TestOllamaConfig:
         client = OllamaClient()
         assert client._url == "http://env-server:9090"
         assert client._model == "env-model"
+
+    def test_http_client_shared(self):
+        first = OllamaClient(timeout=5.0)
+        second = OllamaClient(url="http://myserver:8080")
+        assert first._client is second._client
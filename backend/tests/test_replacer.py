@@ -0,0 +1,64 @@
+"""Tests for single-pass span and multi-string replacement."""
+
+import pytest
+
+from app.services import replacer
+from app.services.replacer import build_replacer, splice
+
+
+class TestSplice:
+    """Tests for the single-pass span replacement helper."""
+
+    def test_replaces_spans(self):
+        text = "John Smith met Jane Doe."
+        result = splice(text, [(0, 10, "Person_A"), (15, 23, "Person_B")])
+        assert result == "Person_A met Person_B."
+
+    def test_no_replacements(self):
+        assert splice("unchanged", []) == "unchanged"
+
+    def test_adjacent_spans(self):
+        assert splice("abcdef", [(0, 3, "X"), (3, 6, "Y")]) == "XY"
+
+    def test_overlapping_span_skipped(self):
+        assert splice("abcdef", [(0, 4, "X"), (2, 6, "Y")]) == "Xef"
+
+
+@pytest.fixture(params=["automaton", "regex"])
+def replace_backend(request, monkeypatch):
+    """Run build_replacer tests with and without pyahocorasick."""
+    if request.param == "regex":
+        monkeypatch.setattr(replacer, "ahocorasick", None)
+    elif replacer.ahocorasick is None:
+        pytest.skip("pyahocorasick not installed")
+    return request.param
+
+
+class TestBuildReplacer:
+    """Tests for the single-sweep multi-name replacement."""
+
+    def test_replaces_all_occurrences(self, replace_backend):
+        replace = build_replacer({"Alice": "Person_A", "Bob": "Person_B"})
+        result = replace("Alice met Bob. Bob thanked Alice.")
+        assert result == "Person_A met Person_B. Person_B thanked Person_A."
+
+    def test_longer_name_wins(self, replace_backend):
+        replace = build_replacer({"John": "Person_B", "John Smith": "Person_A"})
+        assert replace("John Smith and John") == "Person_A and Person_B"
+
+    def test_empty_mapping(self, replace_backend):
+        assert build_replacer({})("Nothing here.") == "Nothing here."
+
+    def test_empty_text(self, replace_backend):
+        assert build_replacer({"Alice": "Person_A"})("") == ""
+
+    def test_special_characters(self, replace_backend):
+        replace = build_replacer(
+            {"(555) 123-4567": "Phone_1", "a.b@c.com": "Email_1"}
+        )
+        assert replace("Call (555) 123-4567 or a.b@c.com") == "Call Phone_1 or Email_1"
+
+    def test_replacer_is_reusable(self, replace_backend):
+        replace = build_replacer({"Alice": "Person_A"})
+        assert replace("Alice") == "Person_A"
+        assert replace("Hi Alice!") == "Hi Person_A!"
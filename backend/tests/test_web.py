@@ -4,27 +4,54 @@ from __future__ import annotations
 
 import io
 import json
+import os
 from pathlib import Path
 
 import pytest
+from flask import jsonify
 
-from app.web import app
+from app import web
+from app.services.mapping_store import MappingStore
+from app.web import anonymize_streams, app
 
+# Upload payloads shared by the multi-file tests
+DOC1 = b"John Smith is here."
+DOC2 = b"Jane Doe is there."
+ROUND_TRIP_ORIGINAL = b"Robert Garcia met with Lisa Wang at Global Finance Corp."
 
-@pytest.fixture
-def client(tmp_path):
-    """Flask test client with temp output directory."""
+
+@pytest.fixture(scope="module")
+def client():
+    """Flask test client shared by the module; the app keeps no per-client state."""
     app.config["TESTING"] = True
     with app.test_client() as c:
         yield c
 
 
-@pytest.fixture
-def anon_output_dir(tmp_path):
-    """Temp directory for anonymized output."""
-    d = tmp_path / "output"
-    d.mkdir()
-    return d
+@pytest.fixture(scope="module")
+def anonymized_upload(client, tmp_path_factory, warm_detector):
+    """Anonymize ROUND_TRIP_ORIGINAL over HTTP once for the module."""
+    resp = client.post("/anonymize", data={
+        "files": (io.BytesIO(ROUND_TRIP_ORIGINAL), "roundtrip.txt"),
+        "output_dir": str(tmp_path_factory.mktemp("anon")),
+        "mapping_id": "rt_test",
+    }, content_type="multipart/form-data")
+    assert resp.status_code == 200
+    data = resp.get_json()
+    return {
+        "content": Path(data["output_path"]).read_bytes(),
+        "mapping_id": data["mapping_id"],
+    }
+
+
+@pytest.fixture(scope="module")
+def anon_output_dir(tmp_path_factory):
+    """Temp directory for anonymized output, shared by the module.
+
+    Tests that write output use distinct upload names so they never read
+    each other's files.
+    """
+    return tmp_path_factory.mktemp("anon_out")
 
 
 class TestIndex:
@@ -51,9 +78,62 @@ class TestMappings:
         """GET /mappings should return a JSON array."""
         resp = client.get("/mappings")
         assert resp.status_code == 200
-        data = json.loads(resp.data)
+        data = resp.get_json()
         assert isinstance(data, list)
 
+    def test_listing_tracks_new_mappings(self, client, tmp_anontool_dir, monkeypatch):
+        """A cached listing still picks up mappings saved after it."""
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        monkeypatch.setattr(web, "_listing_store", lambda: store)
+        monkeypatch.setattr(web, "_mappings_listing", None)
+        assert client.get("/mappings").get_json() == []
+
+        MappingStore.open_cached("fresh", tmp_anontool_dir).save()
+        assert client.get("/mappings").get_json() == ["fresh"]
+
+    def test_listing_expires_despite_coarse_mtime(
+        self, client, tmp_anontool_dir, monkeypatch
+    ):
+        """A change that leaves the dir's mtime as it was shows up after the TTL."""
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        monkeypatch.setattr(web, "_listing_store", lambda: store)
+        monkeypatch.setattr(web, "_mappings_listing", None)
+        monkeypatch.setattr(web, "_LISTING_TTL", 0.0)
+        mappings_dir = store.mappings_dir
+        st = mappings_dir.stat()
+        assert client.get("/mappings").get_json() == []
+
+        MappingStore.open_cached("same-tick", tmp_anontool_dir).save()
+        # Simulate a filesystem whose mtime didn't move for this change
+        os.utime(mappings_dir, ns=(st.st_atime_ns, st.st_mtime_ns))
+        assert client.get("/mappings").get_json() == ["same-tick"]
+
+    def test_unchanged_listing_returns_304(self, client, tmp_anontool_dir, monkeypatch):
+        """A repeat GET with the listing's ETag gets an empty 304."""
+        store = MappingStore(base_dir=tmp_anontool_dir)
+        monkeypatch.setattr(web, "_listing_store", lambda: store)
+        monkeypatch.setattr(web, "_mappings_listing", None)
+        etag = client.get("/mappings").headers["ETag"]
+
+        resp = client.get("/mappings", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.data == b""
+
+        MappingStore.open_cached("fresh", tmp_anontool_dir).save()
+        resp = client.get("/mappings", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.get_json() == ["fresh"]
+
+
+class TestJsonProvider:
+    """Tests for the orjson-backed JSON provider."""
+
+    def test_jsonify_round_trips_unicode(self):
+        with app.test_request_context():
+            resp = jsonify({"name": "José Núñez", "items": [1, 2]})
+        assert json.loads(resp.data) == {"name": "José Núñez", "items": [1, 2]}
+        assert resp.mimetype == "application/json"
+
 
 class TestAnonymize:
     """Tests for the anonymize endpoint."""
@@ -62,7 +142,7 @@ class TestAnonymize:
         """POST /anonymize with no files should return 400."""
         resp = client.post("/anonymize", data={})
         assert resp.status_code == 400
-        data = json.loads(resp.data)
+        data = resp.get_json()
         assert "error" in data
 
     def test_unsupported_files_returns_400(self, client, anon_output_dir):
@@ -73,68 +153,87 @@ class TestAnonymize:
         }, content_type="multipart/form-data")
         assert resp.status_code == 400
 
-    def test_single_file_anonymize(self, client, anon_output_dir):
-        """POST /anonymize with one .txt file should succeed."""
+    @pytest.mark.usefixtures("warm_detector")
+    def test_single_file_anonymize(self, anon_output_dir):
+        """A single .txt upload is anonymized to its own output file."""
         content = b"John Smith met with Jane Doe at Acme Corporation."
-        resp = client.post("/anonymize", data={
-            "files": (io.BytesIO(content), "test.txt"),
-            "output_dir": str(anon_output_dir),
-        }, content_type="multipart/form-data")
+        data = anonymize_streams([("test.txt", io.BytesIO(content))], anon_output_dir)
 
-        assert resp.status_code == 200
-        data = json.loads(resp.data)
         assert "output_path" in data
         assert "mapping_id" in data
-        assert Path(data["output_path"]).exists()
 
-        # Verify anonymization worked
+        # Verify anonymization worked; read_text() fails if the file is missing
         output_text = Path(data["output_path"]).read_text()
         assert "John Smith" not in output_text
 
-    def test_multiple_files_merged(self, client, anon_output_dir):
-        """POST /anonymize with multiple files and merge=true should produce one output."""
-        resp = client.post("/anonymize", data={
-            "files": [
-                (io.BytesIO(b"John Smith is here."), "doc1.txt"),
-                (io.BytesIO(b"Jane Doe is there."), "doc2.txt"),
-            ],
-            "output_dir": str(anon_output_dir),
-            "merge": "true",
-        }, content_type="multipart/form-data")
+    @pytest.mark.usefixtures("warm_detector")
+    def test_multiple_files_merged(self, anon_output_dir):
+        """Several uploads with merge=True should produce one output."""
+        data = anonymize_streams(
+            [("doc1.txt", io.BytesIO(DOC1)), ("doc2.txt", io.BytesIO(DOC2))],
+            anon_output_dir,
+            merge=True,
+        )
 
-        assert resp.status_code == 200
-        data = json.loads(resp.data)
         assert data["files_processed"] == 2
-        assert Path(data["output_path"]).exists()
+        merged = Path(data["output_path"]).read_text()
+        assert "John Smith" not in merged
+
+    @pytest.mark.usefixtures("warm_detector")
+    def test_multiple_files_separate(self, anon_output_dir):
+        """Several uploads without merge should produce separate outputs."""
+        data = anonymize_streams(
+            [("doc1.txt", io.BytesIO(DOC1)), ("doc2.txt", io.BytesIO(DOC2))],
+            anon_output_dir,
+        )
 
-    def test_multiple_files_separate(self, client, anon_output_dir):
-        """POST /anonymize with multiple files and merge=false should produce separate outputs."""
+        assert data["files_processed"] == 2
+        assert len(data["results"]) == 2
+
+    def test_multiple_files_streamed_as_ndjson(self, client, anon_output_dir):
+        """Clients accepting NDJSON get one line per file plus a summary."""
         resp = client.post("/anonymize", data={
             "files": [
-                (io.BytesIO(b"John Smith is here."), "doc1.txt"),
-                (io.BytesIO(b"Jane Doe is there."), "doc2.txt"),
+                (io.BytesIO(b"write to bob@example.com"), "email.txt"),
+                (io.BytesIO(b"or call 555-123-4567"), "phone.txt"),
             ],
             "output_dir": str(anon_output_dir),
-            "merge": "false",
-        }, content_type="multipart/form-data")
+            "mapping_id": "ndjson_test",
+        }, content_type="multipart/form-data",
+            headers={"Accept": "application/x-ndjson"})
 
         assert resp.status_code == 200
-        data = json.loads(resp.data)
-        assert data["files_processed"] == 2
-        assert len(data["results"]) == 2
-
-    def test_custom_mapping_id(self, client, anon_output_dir):
+        assert resp.mimetype == "application/x-ndjson"
+        lines = [json.loads(line) for line in resp.data.splitlines()]
+        assert [Path(r["output_path"]).name for r in lines[:2]] == [
+            "email.anon.txt",
+            "phone.anon.txt",
+        ]
+        assert all(r["mapping_id"] == "ndjson_test" for r in lines[:2])
+        assert lines[2] == {"files_processed": 2}
+
+    @pytest.mark.usefixtures("warm_detector")
+    def test_custom_mapping_id(self, anon_output_dir):
         """Should use provided mapping ID."""
         content = b"Sarah Johnson works at TechStart."
+        data = anonymize_streams(
+            [("custom.txt", io.BytesIO(content))],
+            anon_output_dir,
+            mapping_id="my_custom_id",
+        )
+        assert data["mapping_id"] == "my_custom_id"
+
+    def test_hidden_name_is_not_an_extension(self, client, anon_output_dir):
+        """An upload named just ".txt" is unsupported: 400, not a 500."""
         resp = client.post("/anonymize", data={
-            "files": (io.BytesIO(content), "test.txt"),
+            "files": (io.BytesIO(b"data"), ".txt"),
             "output_dir": str(anon_output_dir),
-            "mapping_id": "my_custom_id",
         }, content_type="multipart/form-data")
+        assert resp.status_code == 400
 
-        assert resp.status_code == 200
-        data = json.loads(resp.data)
-        assert data["mapping_id"] == "my_custom_id"
+    def test_streams_without_supported_files_raise(self, anon_output_dir):
+        with pytest.raises(ValueError, match="No supported files"):
+            anonymize_streams([("file.csv", io.BytesIO(b"data"))], anon_output_dir)
 
 
 class TestDeanonymize:
@@ -151,33 +250,18 @@ class TestDeanonymize:
             "file": (io.BytesIO(b"Person_A is here."), "test.anon.txt"),
         }, content_type="multipart/form-data")
         assert resp.status_code == 400
-        data = json.loads(resp.data)
+        data = resp.get_json()
         assert "Mapping ID" in data["error"]
 
-    def test_round_trip(self, client, anon_output_dir):
-        """Anonymize then de-anonymize should produce original content."""
-        original = b"Robert Garcia met with Lisa Wang at Global Finance Corp."
-
-        # Step 1: Anonymize
-        resp = client.post("/anonymize", data={
-            "files": (io.BytesIO(original), "roundtrip.txt"),
-            "output_dir": str(anon_output_dir),
-            "mapping_id": "rt_test",
-        }, content_type="multipart/form-data")
-        assert resp.status_code == 200
-        anon_data = json.loads(resp.data)
-
-        # Step 2: Read anonymized file and de-anonymize
-        anon_path = Path(anon_data["output_path"])
-        anon_content = anon_path.read_bytes()
-
+    def test_round_trip(self, client, anonymized_upload, anon_output_dir):
+        """De-anonymizing the anonymized upload should restore the original."""
         resp = client.post("/deanonymize", data={
-            "file": (io.BytesIO(anon_content), "roundtrip.anon.txt"),
+            "file": (io.BytesIO(anonymized_upload["content"]), "roundtrip.anon.txt"),
             "output_dir": str(anon_output_dir),
-            "mapping_id": "rt_test",
+            "mapping_id": anonymized_upload["mapping_id"],
         }, content_type="multipart/form-data")
         assert resp.status_code == 200
-        deanon_data = json.loads(resp.data)
+        deanon_data = resp.get_json()
 
         restored = Path(deanon_data["output_path"]).read_text()
-        assert restored == original.decode()
+        assert restored == ROUND_TRIP_ORIGINAL.decode()